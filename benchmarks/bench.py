@@ -0,0 +1,280 @@
+#! /usr/bin/env python3
+'''
+Benchmarks of building a synthetic site.
+
+A site is generated with :mod:`corpus`, and built by ``ssg --profile`` in
+scenarios run in order:
+
+cold
+    Build from scratch, without output, cache, or build state.
+noop
+    Build again, with nothing changed.
+post_edit
+    Build after editing a single post.
+template_edit
+    Build after editing the base template.
+config_edit
+    Build after editing ``config.py``.
+
+The scenarios are repeated, and the median of the wall time, and of each
+stage of the build, like *process_content*, *apply_templates*, *generators*,
+and *write*, and of each generator, is saved as JSON::
+
+    python3 benchmarks/bench.py --posts 1000 --output results.json
+
+Saved results can be used as a baseline, and the stages that got slower than
+the tolerance are listed, and make the benchmark fail::
+
+    python3 benchmarks/bench.py --posts 1000 --baseline results.json
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import corpus
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+'''Root of the ssg source tree.'''
+
+SCENARIOS = ('cold', 'noop', 'post_edit', 'template_edit', 'config_edit')
+'''Names of the scenarios, in the order they are run.'''
+
+
+def _clean(path):
+    '''Remove the output, cache, and build state of a site.
+
+    :param path: Root of the site.
+    :type path: string
+    '''
+    for name in ('output', '.ssg-cache'):
+        shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    for name in os.listdir(path):
+        if name.startswith('.ssg-'):
+            os.remove(os.path.join(path, name))
+    os.mkdir(os.path.join(path, 'output'))
+
+
+def _edit_post(path, run):
+    '''Add a paragraph to the first post.
+
+    :param path: Root of the site.
+    :type path: string
+    :param run: Number of the run, making each edit different.
+    :type run: int
+    '''
+    for dir_path, _, filenames in sorted(os.walk(os.path.join(path,
+                                                              'content'))):
+        for filename in sorted(filenames):
+            if filename.startswith('post') and filename.endswith('.md'):
+                with open(os.path.join(dir_path, filename), 'a') as post:
+                    post.write('\nEdited in run {0}.\n'.format(run))
+                return
+
+
+def _edit_template(path, run):
+    '''Add a comment to the base template, changing every page.
+
+    :param path: Root of the site.
+    :type path: string
+    :param run: Number of the run, making each edit different.
+    :type run: int
+    '''
+    with open(os.path.join(path, 'templates', 'base.html'), 'a') as template:
+        template.write('<!-- Edited in run {0}. -->\n'.format(run))
+
+
+def _edit_config(path, run):
+    '''Change the name of the site in the configuration.
+
+    :param path: Root of the site.
+    :type path: string
+    :param run: Number of the run, making each edit different.
+    :type run: int
+    '''
+    corpus.write_config(path, 'Benchmark {0}'.format(run))
+
+
+EDITS = {'post_edit': _edit_post, 'template_edit': _edit_template,
+         'config_edit': _edit_config}
+'''Edits made before the scenarios, by name.'''
+
+
+def _build(path, args):
+    '''Build the site with ssg, profiling it.
+
+    :param path: Root of the site.
+    :type path: string
+    :param args: Extra command line arguments to ssg.
+    :type args: list
+    :return: Wall time, and total time of each stage, and generator, in
+             milliseconds.
+    :rtype: dict
+    '''
+    trace_filename = os.path.join(path, 'trace.json')
+    # Build with the ssg of this source tree
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + env.get('PYTHONPATH', '').split(os.pathsep)).rstrip(
+            os.pathsep)
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable,
+                              os.path.join(ROOT, 'scripts', 'ssg'),
+                              '--profile', trace_filename] + args,
+                             cwd=path, env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT,
+                             universal_newlines=True)
+    wall = (time.perf_counter() - start) * 1000
+    if process.returncode != 0:
+        print(process.stdout[-4000:])
+        raise RuntimeError('Build failed in: {0}'.format(path))
+    result = {'wall': wall}
+    with open(trace_filename) as trace_file:
+        events = json.load(trace_file)['traceEvents']
+    os.remove(trace_filename)
+    for event in events:
+        if event['cat'] == 'stage':
+            name = event['name']
+        elif event['cat'] == 'generator':
+            name = 'generator.' + event['name']
+        else:
+            continue
+        result[name] = result.get(name, 0) + event['dur'] / 1000
+    return result
+
+
+def run(path, repeat, args):
+    '''Run all scenarios on a site.
+
+    :param path: Root of the site.
+    :type path: string
+    :param repeat: Number of times to run the scenarios.
+    :type repeat: int
+    :param args: Extra command line arguments to ssg.
+    :type args: list
+    :return: Median time of each stage, by scenario.
+    :rtype: dict
+    '''
+    timings = dict((scenario, list()) for scenario in SCENARIOS)
+    for run_number in range(repeat):
+        for scenario in SCENARIOS:
+            if scenario == 'cold':
+                _clean(path)
+            elif scenario in EDITS:
+                EDITS[scenario](path, run_number)
+            timings[scenario].append(_build(path, args))
+            print('{0:<14} run {1}: {2:10.1f} ms'.format(
+                scenario, run_number + 1, timings[scenario][-1]['wall']))
+    results = dict()
+    for scenario, runs in timings.items():
+        stages = sorted(set(stage for result in runs for stage in result))
+        results[scenario] = dict(
+            (stage, round(statistics.median(result.get(stage, 0)
+                                            for result in runs), 3))
+            for stage in stages)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''Print the results next to a baseline, and find the regressions.
+
+    Stages taking less than a millisecond in the baseline are not counted
+    as regressions, they are mostly noise.
+
+    :param results: Results of the benchmark.
+    :type results: dict
+    :param baseline: Results of an earlier run.
+    :type baseline: dict
+    :param tolerance: How much slower a stage can get, like 0.1 for 10%.
+    :type tolerance: float
+    :return: Scenario, and stage, of each regression.
+    :rtype: list
+    '''
+    if baseline['corpus'] != results['corpus']:
+        print('Warning: the baseline was run on another corpus.')
+    if baseline['ssg_args'] != results['ssg_args']:
+        print('Warning: the baseline was run with other arguments to ssg.')
+    regressions = list()
+    print('{0:<14} {1:<32} {2:>12} {3:>12} {4:>8}'.format(
+        'Scenario', 'Stage', 'Baseline ms', 'Now ms', 'Change'))
+    for scenario, stages in results['scenarios'].items():
+        before_stages = baseline['scenarios'].get(scenario, dict())
+        for stage, now in stages.items():
+            if stage not in before_stages:
+                continue
+            before = before_stages[stage]
+            change = (now - before) / before if before > 0 else 0
+            flag = ''
+            if before >= 1 and change > tolerance:
+                regressions.append((scenario, stage))
+                flag = ' !'
+            print('{0:<14} {1:<32} {2:12.2f} {3:12.2f} {4:+7.1%}{5}'.format(
+                scenario, stage, before, now, change, flag))
+    return regressions
+
+
+def main():
+    '''
+    The entry point.
+    '''
+    arg_parser = argparse.ArgumentParser(
+        description='Benchmark building a synthetic site.')
+    arg_parser.add_argument('--site', default=None,
+                            help='Directory of the generated site. Default '
+                            'is a temporary directory.')
+    arg_parser.add_argument('--repeat', type=int, default=3,
+                            help='Number of times to run the scenarios. '
+                            'Default is 3.')
+    arg_parser.add_argument('--output', default=None,
+                            help='Save the results as JSON in this file.')
+    arg_parser.add_argument('--baseline', default=None,
+                            help='Compare the results to those in this file.')
+    arg_parser.add_argument('--tolerance', type=float, default=0.1,
+                            help='How much slower a stage can get, before it '
+                            'is a regression. Default is 0.1, or 10%%.')
+    arg_parser.add_argument('--ssg-args', dest='ssg_args', default='',
+                            help='Extra arguments to ssg, like "-j 4".')
+    for key, value in corpus.DEFAULTS.items():
+        arg_parser.add_argument('--' + key.replace('_', '-'), dest=key,
+                                type=type(value), default=value,
+                                help='Corpus parameter. Default is '
+                                '{0}.'.format(value))
+    args = arg_parser.parse_args()
+
+    params = dict((key, getattr(args, key)) for key in corpus.DEFAULTS)
+    site = args.site
+    if site is None:
+        site = tempfile.mkdtemp(prefix='ssg-bench-')
+    try:
+        corpus.generate(site, **params)
+        scenarios = run(site, args.repeat, args.ssg_args.split())
+    finally:
+        if args.site is None:
+            shutil.rmtree(site, ignore_errors=True)
+    results = {'corpus': params,
+               'ssg_args': args.ssg_args,
+               'repeat': args.repeat,
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'scenarios': scenarios}
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4, sort_keys=True)
+        print('Saved results to: {0}'.format(args.output))
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print('{0} regressions.'.format(len(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
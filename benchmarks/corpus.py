@@ -0,0 +1,314 @@
+#! /usr/bin/env python3
+'''
+Generator of synthetic sites, used by the benchmarks.
+
+A site has posts spread over a tree of category directories, a few pages,
+figures, and the ``config.py`` and templates needed to build it with all
+extensions of ssg enabled. Tags, and categories, are picked with a Zipf like
+distribution, so a few are used by many posts, and most by few.
+
+The same parameters, and seed, always give the same site::
+
+    python3 benchmarks/corpus.py /tmp/corpus --posts 1000 --figures 2
+'''
+import argparse
+import os
+import random
+import shutil
+
+
+DEFAULTS = {
+    'posts': 200,
+    'pages': 5,
+    'tags': 40,
+    'tags_per_post': 3,
+    'categories': 5,
+    'depth': 2,
+    'skew': 1.0,
+    'paragraphs': 8,
+    'figures': 1,
+    'figure_size': 16384,
+    'code_blocks': 1,
+    'seed': 42
+}
+'''Default parameters of the corpus.'''
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua enim '
+         'ad minim veniam quis nostrud exercitation ullamco laboris nisi '
+         'aliquip ex ea commodo consequat duis aute irure in reprehenderit '
+         'voluptate velit esse cillum fugiat nulla pariatur').split()
+'''Words of the generated text.'''
+
+CONFIG = '''CONFIG = {{
+    'SITENAME': {sitename!r},
+    'METAPARSERS': ['CategoryMetaParser'],
+    'GENERATORS': ['BlogIndexGenerator', 'CategoryIndexGenerator',
+                   'TagCloudGenerator'],
+    'CONTENTFILTERS': ['LocalURL'],
+    'POSTSPERINDEX': 10,
+    'POSTSPERCATEGORYINDEX': 10,
+    'POSTSPERTAGINDEX': 10,
+    'LOGFILE': ''
+}}
+'''
+'''Template of the configuration of the site.'''
+
+TEMPLATES = {
+    'base.html': '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{{ content.metadata.title }} - {{ context.settings.SITENAME }}</title>
+</head>
+<body>
+<header><a href="{{ context.settings.SITEURL }}">{{ context.settings.SITENAME }}</a></header>
+{% block body %}{% endblock %}
+<footer>{{ context.settings.AUTHOR }}</footer>
+</body>
+</html>
+''',
+    'post.html': '''{% extends "base.html" %}
+{% block body %}
+<article>
+<h1>{{ content.metadata.title }}</h1>
+<time>{{ content.metadata.date }}</time>
+{{ content.content }}
+<ul class="tags">
+{% for tag, filename in content.metadata.tagfiles.items() %}<li><a href="{{ filename }}">{{ tag }}</a></li>
+{% endfor %}</ul>
+<a href="{{ content.metadata.catfile }}">Category</a>
+</article>
+{% endblock %}
+''',
+    'page.html': '''{% extends "base.html" %}
+{% block body %}
+<article>
+<h1>{{ content.metadata.title }}</h1>
+{{ content.content }}
+</article>
+{% endblock %}
+''',
+    'index.html': '''{% extends "base.html" %}
+{% block body %}
+{% for post in posts %}<section>
+<h2><a href="{{ post.metadata.URL }}">{{ post.metadata.title }}</a></h2>
+<time>{{ post.metadata.date }}</time>
+</section>
+{% endfor %}
+<nav>{{ content.metadata.page }} / {{ content.metadata.pages }}</nav>
+{% endblock %}
+''',
+    'category.html': '''{% extends "index.html" %}
+''',
+    'tag.html': '''{% extends "index.html" %}
+''',
+    'categories.html': '''<!DOCTYPE html>
+<html>
+<body>
+<ul>
+{% for name in category_names %}<li><a href="{{ categories[name].filename }}">{{ name }}</a></li>
+{% endfor %}</ul>
+</body>
+</html>
+''',
+    'tagcloud.html': '''<!DOCTYPE html>
+<html>
+<body>
+<ul>
+{% for name in tag_names %}<li><a href="{{ tags[name].filename }}">{{ name }} ({{ tags[name]['items'] }})</a></li>
+{% endfor %}</ul>
+</body>
+</html>
+'''
+}
+'''Templates of the site, by file name.'''
+
+
+def _get_weights(count, skew):
+    '''Get Zipf like weights of a number of choices.
+
+    :param count: Number of choices.
+    :type count: int
+    :param skew: Exponent of the distribution, 0 is uniform.
+    :type skew: float
+    :rtype: list
+    '''
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+def _get_sentence(rng, words=12):
+    '''Get a sentence of random words.
+
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :param words: Number of words.
+    :type words: int
+    :rtype: string
+    '''
+    sentence = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return sentence.capitalize() + '.'
+
+
+def _get_paragraph(rng):
+    '''Get a paragraph of random sentences, with some emphasis.
+
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :rtype: string
+    '''
+    sentences = [_get_sentence(rng, rng.randint(6, 18))
+                 for _ in range(rng.randint(3, 7))]
+    sentences[0] = '**' + sentences[0][:-1] + '**.'
+    return ' '.join(sentences)
+
+
+def _get_code_block(rng):
+    '''Get a fenced block of Python code.
+
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :rtype: string
+    '''
+    lines = ['```python', 'def {0}_{1}(items):'.format(rng.choice(WORDS),
+                                                    rng.choice(WORDS))]
+    for number in range(rng.randint(3, 12)):
+        lines.append('    {0} = [item * {1} for item in items]'.format(
+            rng.choice(WORDS), number))
+    lines += ['    return items', '```']
+    return '\n'.join(lines)
+
+
+def _get_body(rng, params, name, path):
+    '''Get the Markdown body of a page, writing the images of its figures.
+
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :param params: Parameters of the corpus.
+    :type params: dict
+    :param name: Name of the page, used to name its figures.
+    :type name: string
+    :param path: Directory of the page.
+    :type path: string
+    :rtype: string
+    '''
+    blocks = ['# ' + _get_sentence(rng, 4)[:-1]]
+    blocks += [_get_paragraph(rng) for _ in range(params['paragraphs'])]
+    for _ in range(params['code_blocks']):
+        blocks.insert(rng.randint(1, len(blocks)), _get_code_block(rng))
+    for number in range(params['figures']):
+        image = '{0}-{1}.png'.format(name, number)
+        with open(os.path.join(path, image), 'wb') as image_file:
+            image_file.write(rng.randbytes(params['figure_size']))
+        blocks.insert(rng.randint(1, len(blocks)),
+                      '!{{Figure {0}}}({1})'.format(number, image))
+    # Link to the page itself, using the content filter
+    blocks.append('[Permalink]($LOCALURL/{0}.html)'.format(name))
+    return '\n\n'.join(blocks) + '\n'
+
+
+def _write_page(filename, metadata, body):
+    '''Write a content file.
+
+    :param filename: Name of the file.
+    :type filename: string
+    :param metadata: Meta data of the page.
+    :type metadata: list
+    :param body: Markdown of the page.
+    :type body: string
+    '''
+    with open(filename, 'w') as content_file:
+        for key, value in metadata:
+            content_file.write('{0}: {1}\n'.format(key, value))
+        content_file.write('\n')
+        content_file.write(body)
+
+
+def write_config(path, sitename='Benchmark'):
+    '''Write the ``config.py`` of a site.
+
+    :param path: Root of the site.
+    :type path: string
+    :param sitename: Name of the site.
+    :type sitename: string
+    '''
+    with open(os.path.join(path, 'config.py'), 'w') as config_file:
+        config_file.write(CONFIG.format(sitename=sitename))
+
+
+def generate(path, **params):
+    '''Generate a site, replacing anything already at the path.
+
+    :param path: Root of the site.
+    :type path: string
+    :param params: Parameters of the corpus, see :data:`DEFAULTS`.
+    :return: The parameters used.
+    :rtype: dict
+    '''
+    params = dict(DEFAULTS, **params)
+    rng = random.Random(params['seed'])
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    content_path = os.path.join(path, 'content')
+    template_path = os.path.join(path, 'templates')
+    os.makedirs(content_path)
+    os.makedirs(template_path)
+    os.makedirs(os.path.join(path, 'output'))
+    write_config(path)
+    for name, template in TEMPLATES.items():
+        with open(os.path.join(template_path, name), 'w') as template_file:
+            template_file.write(template)
+
+    tags = ['tag{0:03d}'.format(number) for number in range(params['tags'])]
+    tag_weights = _get_weights(len(tags), params['skew'])
+    categories = ['cat{0:02d}'.format(number)
+                  for number in range(params['categories'])]
+    category_weights = _get_weights(len(categories), params['skew'])
+    for number in range(params['posts']):
+        name = 'post{0:05d}'.format(number)
+        # A path of categories, one directory for each level
+        path_parts = ['blog']
+        for level in range(params['depth']):
+            category = rng.choices(categories, category_weights)[0]
+            path_parts.append(category if level == 0 else
+                              '{0}-{1}'.format(path_parts[-1], category))
+        post_path = os.path.join(content_path, *path_parts)
+        os.makedirs(post_path, exist_ok=True)
+        post_tags = set(rng.choices(tags, tag_weights,
+                                    k=params['tags_per_post']))
+        metadata = [('title', _get_sentence(rng, 5)[:-1]),
+                    ('date', '{0}-{1:02d}-{2:02d} {3:02d}:{4:02d}'.format(
+                        2000 + number % 20, number % 12 + 1, number % 28 + 1,
+                        number % 24, number % 60)),
+                    ('template', 'post'),
+                    ('tags', ', '.join(sorted(post_tags)))]
+        _write_page(os.path.join(post_path, name + '.md'), metadata,
+                    _get_body(rng, params, name, post_path))
+    for number in range(params['pages']):
+        name = 'page{0:03d}'.format(number)
+        metadata = [('title', _get_sentence(rng, 3)[:-1]),
+                    ('template', 'page')]
+        _write_page(os.path.join(content_path, name + '.md'), metadata,
+                    _get_body(rng, params, name, content_path))
+    return params
+
+
+def main():
+    '''
+    The entry point.
+    '''
+    arg_parser = argparse.ArgumentParser(
+        description='Generate a synthetic site.')
+    arg_parser.add_argument('path', help='Root directory of the site.')
+    for key, value in DEFAULTS.items():
+        arg_parser.add_argument('--' + key.replace('_', '-'), dest=key,
+                                type=type(value), default=value,
+                                help='Default is {0}.'.format(value))
+    params = vars(arg_parser.parse_args())
+    path = params.pop('path')
+    generate(path, **params)
+    print('Generated {0} posts in: {1}'.format(params['posts'], path))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,30 +7,31 @@ Version 0.0.5:
 
 """
 
+import importlib
 import logging
 import os
-import codecs
-import markdown
+from functools import partial
 from string import Template
 from ssg import writer
-from jinja2 import Environment, FileSystemLoader, TemplateSyntaxError
-from jinja2 import TemplateError
+from ssg.cache import RenderCache
+from ssg.buildstate import BuildState, get_settings_hash
 from ssg.log import logger, init_file_log, init_console_log, close_log
-from ssg.metaext import parsers_run
+from ssg.log import init_queue_log, init_worker_log
+from ssg.metadata import META_PARSERS, read_header
+from ssg.metaext import parsers_prepare, parsers_run
 from ssg import settings
 from ssg.settings import SETTINGS, write_config
-from ssg.tools import get_files, get_datetime, die
-from ssg.context import CONTEXT
+from ssg.tools import get_snapshot, forget_snapshots, get_datetime, die
+from ssg.context import CONTEXT, Content
 from ssg import generators
 from ssg import contentfilters
-# Markdown extensions
-from ssg.markdownext.figure import FigureExtension
+from ssg import publish
+from ssg import profiler
+from ssg import pagereport
 
 
 __version__ = '0.0.5'
 configs = {}
-# Instantiate Markdown extensions
-figure = FigureExtension(configs=configs)
 
 # Extra extensions
 # Meta-data extension
@@ -39,11 +40,21 @@ figure = FigureExtension(configs=configs)
 MARKDOWN_EXTENSIONS = ['markdown.extensions.extra',
                        'markdown.extensions.meta',
                        'markdown.extensions.toc',
-                       figure]
-"""Markdown extension to use."""
+                       'ssg.markdownext.figure.FigureExtension']
+"""Markdown extension to use. Extensions of ssg are named by their class,
+and instantiated when the Markdown processor is created."""
 
 DEBUG = False
 
+RENDER_CACHE = None
+"""Cache of converted Markdown, None if disabled."""
+
+_LOADED_CONTENT = list()
+"""Content converted while rendering, when streaming."""
+
+_MARKDOWN = None
+"""Markdown processor of this process."""
+
 
 class ContentParserError(RuntimeError):
     """
@@ -62,8 +73,6 @@ def init(debug=False, root=None):
     :type root: string
     """
     global DEBUG
-    # Init logging to file
-    init_file_log(logging.DEBUG)
     # Set the console logging level
     if debug:
         init_console_log(logging.DEBUG)
@@ -72,6 +81,15 @@ def init(debug=False, root=None):
         init_console_log(logging.INFO)
     # Init settings placeholder
     settings.init(root)
+    # Init logging to file
+    level = logging.getLevelName(str(SETTINGS['LOGLEVEL']).upper())
+    if not isinstance(level, int):
+        logger.warning('Unknown log level "%s", using DEBUG.',
+                       SETTINGS['LOGLEVEL'])
+        level = logging.DEBUG
+    init_file_log(level, SETTINGS['LOGFILE'])
+    if SETTINGS['LOGQUEUE']:
+        init_queue_log()
 
 
 def _get_html_file_name(metadata):
@@ -97,7 +115,7 @@ def _get_url(metadata, file_name):
     :param metadata: Meta data to use. *src_file* key must be present.
     :type metadata: dict
     """
-    logger.debug('Generating URL from: ' + str(metadata) + ' + ' + file_name)
+    logger.debug('Generating URL from: %s + %s', metadata, file_name)
     # Start with the site URL
     site_url = SETTINGS['SITEURL'] + '/'
     # Get path starting from content
@@ -110,18 +128,18 @@ def _get_url(metadata, file_name):
 
     # Add the filename to the URL
     url = os.path.join(site_url, source_relative_path, file_name)
-    logger.debug('URL: ' + url)
+    logger.debug('URL: %s', url)
     return url
 
 
-def _new_metadata(filename, md):
+def _new_metadata(filename, meta):
     """
     Create new meta data from a Markdown file.
 
     :param filename: The full path of the source Markdown file.
     :type filename: string
-    :param md: An instance of the Markdown preprocessor
-    :type md: markdown.Markdown
+    :param meta: Meta data found by the Markdown meta data extension.
+    :type meta: dict
     """
 
     logger.debug("Creating new metadata.")
@@ -149,17 +167,17 @@ def _new_metadata(filename, md):
         _get_html_file_name(metadata)
     )
     # Check for meta data
-    if len(md.Meta) == 0:
+    if len(meta) == 0:
         raise ContentParserError('No meta data found.')
     # Splice the lines together
-    for key, item in md.Meta.items():
+    for key, item in meta.items():
         item = ''.join(item)
         # Add meta data from the meta data markdown extension
         try:
             tmpl = Template(item)
             item = tmpl.substitute(LOCALURL=_get_url(metadata, ''))
         except KeyError as exception:
-            logger.error('Could not find key ' + str(exception) + '.')
+            logger.error('Could not find key %s.', exception)
             logger.error('Maybe a missing $ character.')
             raise exception
 
@@ -169,10 +187,311 @@ def _new_metadata(filename, md):
         metadata['date'] = get_datetime(metadata['date'])
     # Run through extra meta data parsers.
     metadata.update(parsers_run(filename))
-    logger.debug('Metadata: ' + str(metadata))
+    logger.debug('Metadata: %s', metadata)
     return metadata
 
 
+def _scan_file(filename):
+    """
+    Create content from the meta data header of a Markdown file, without
+    converting the rest of the file.
+
+    :param filename: The full path of the source Markdown file.
+    :type filename: string
+    :returns: The content, with meta data but no HTML.
+    :rtype: dict
+    """
+    logger.debug('Scanning: %s', filename)
+    # Create content
+    content = Content()
+    # Add meta data
+    content['metadata'] = _new_metadata(filename, read_header(filename))
+    return content
+
+
+def _check_file(filename):
+    """
+    Scan a Markdown file, and run the sanity checks on its meta data.
+
+    :param filename: The full path of the source Markdown file.
+    :type filename: string
+    :returns: The content, with meta data but no HTML.
+    :rtype: dict
+    """
+    content = _scan_file(filename)
+    _sanity_check(content)
+    return content
+
+
+def _get_markdown():
+    """
+    Get the Markdown processor, creating it the first time. The processor is
+    reset before it is returned, and reused for all files converted by this
+    process.
+
+    :returns: The Markdown processor.
+    :rtype: markdown.Markdown
+    """
+    global _MARKDOWN
+    if _MARKDOWN is None:
+        # Imported here, Markdown is only needed to convert content
+        import markdown
+        extensions = list()
+        for extension in MARKDOWN_EXTENSIONS:
+            if extension.startswith('ssg.'):
+                module, name = extension.rsplit('.', 1)
+                extension = getattr(importlib.import_module(module),
+                                    name)(configs=configs)
+            extensions.append(extension)
+        # Create an instance of the Markdown processor
+        _MARKDOWN = markdown.Markdown(extensions=extensions,
+                                      output_format='html5')
+    else:
+        _MARKDOWN.reset()
+    return _MARKDOWN
+
+
+def _process_file(content):
+    """
+    Convert the Markdown file of some content to HTML, and run the content
+    filters on it.
+
+    :param content: The content to convert. The meta data must be present.
+    :type content: dict
+    :returns: The content with the HTML added.
+    :rtype: dict
+    """
+    filename = content['metadata']['src_file']
+    # Open it
+    with open(filename, 'rb') as markdown_file:
+        logger.info("Reading: %s", filename)
+        source = markdown_file.read()
+    # Look for the converted file in the cache
+    cached = None
+    with pagereport.measure(content, 'convert_ms'):
+        if RENDER_CACHE is not None:
+            key = RENDER_CACHE.key(source)
+            cached = RENDER_CACHE.get(key)
+        if cached is None:
+            md = _get_markdown()
+            # Convert file to html
+            html_content = md.convert(source.decode('utf-8'))
+            if RENDER_CACHE is not None:
+                RENDER_CACHE.put(key, html_content, md.Meta)
+        else:
+            logger.debug('Using cached HTML for: %s', filename)
+            html_content, _ = cached
+    pagereport.record(content, cached=cached is not None)
+    # Add content
+    content['content'] = html_content
+    # Run content filters on content
+    with pagereport.measure(content, 'filter_ms'):
+        contentfilters.run(content)
+    return content
+
+
+def _load_content(content):
+    """
+    Convert the HTML of content while rendering, and remember to free it
+    again.
+
+    :param content: The content to convert.
+    :type content: dict
+    """
+    _process_file(content)
+    _LOADED_CONTENT.append(content)
+
+
+def _free_content():
+    """
+    Free the HTML of all content converted while rendering.
+    """
+    for content in _LOADED_CONTENT:
+        content.pop('content', None)
+    del _LOADED_CONTENT[:]
+
+
+Content.loader = _load_content
+
+
+def _job(function, item, filename):
+    """
+    Run a job, returning any exception instead of raising it.
+
+    Exceptions raised in a worker process are re-raised by the process pool
+    at the start of the chunk they happened in, which may not be the failing
+    file. Returning them keeps the error tied to the right source file.
+
+    :param function: The function doing the job.
+    :type function: function
+    :param item: The argument to the function.
+    :param filename: The source file of the job.
+    :type filename: string
+    :returns: The result, the exception and traceback if one occured, the
+              profiling events, and the page report of a worker process.
+    :rtype: tuple
+    """
+    try:
+        with profiler.span(getattr(function, 'func', function).__name__,
+                           'file', {'file': filename}):
+            result = function(item)
+        return (result, None, profiler.take_worker_events(),
+                pagereport.take_worker_pages())
+    except Exception as exception:
+        import traceback
+        return (None, (exception, traceback.format_exc()),
+                profiler.take_worker_events(), pagereport.take_worker_pages())
+
+
+def _init_worker(settings, debug, render_cache, context, meta_parsers):
+    """
+    Initialise a worker process with the settings of the parent process.
+
+    :param settings: The settings of the site.
+    :type settings: dict
+    :param debug: True if debugging is enabled.
+    :type debug: bool
+    :param render_cache: Cache of converted Markdown, or None.
+    :type render_cache: ssg.cache.RenderCache
+    :param context: The context of the site, or None.
+    :type context: ssg.context.Context
+    :param meta_parsers: The meta data parsers, as prepared by the parent.
+    :type meta_parsers: list
+    """
+    global CONTEXT, DEBUG, RENDER_CACHE
+    init_worker_log()
+    profiler.init_worker()
+    pagereport.init_worker()
+    SETTINGS.update(settings)
+    DEBUG = debug
+    RENDER_CACHE = render_cache
+    if context is not None:
+        CONTEXT = context
+    # Use what the parsers prepared, also where the workers are not forked
+    META_PARSERS[:] = meta_parsers
+
+
+def _run_jobs(function, items, filenames, context=None):
+    """
+    Run a function on a list of items, yielding the results in order.
+
+    If the *JOBS* setting is larger than one, the items are handed to a pool
+    of worker processes. Worker processes are forked where the platform
+    supports it, so passing the context, and the prepared meta data parsers,
+    to them is cheap. Elsewhere, these are pickled.
+
+    :param function: The function to run. Must be picklable.
+    :type function: function
+    :param items: The arguments to the function. Must be picklable.
+    :type items: list
+    :param filenames: The source file of each item.
+    :type filenames: list
+    :param context: The context of the site, if needed by the workers.
+    :type context: ssg.context.Context
+    :returns: Generator of filename, result, and error tuples.
+    """
+    executor = None
+    jobs = SETTINGS['JOBS']
+    if jobs > 1 and len(items) > 1:
+        logger.debug('Using %s worker processes.', jobs)
+        # Imported here, it is only needed with more than one job
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+        mp_context = None
+        if 'fork' in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context('fork')
+        executor = ProcessPoolExecutor(max_workers=jobs,
+                                       mp_context=mp_context,
+                                       initializer=_init_worker,
+                                       initargs=(dict(SETTINGS), DEBUG,
+                                                 RENDER_CACHE, context,
+                                                 list(META_PARSERS)))
+        # Hand out the items in chunks to cut down on IPC overhead
+        chunksize = max(1, len(items) // (jobs * 4))
+        results = executor.map(partial(_job, function), items, filenames,
+                               chunksize=chunksize)
+    else:
+        results = map(partial(_job, function), items, filenames)
+
+    try:
+        for filename, (result, error, events, pages) in zip(filenames,
+                                                            results):
+            if events is not None:
+                profiler.add_events(events)
+            if pages is not None:
+                pagereport.add_pages(pages)
+            yield filename, result, error
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _report_error(filename, error):
+    """
+    Log an error returned by a job.
+
+    :param filename: The source file of the job.
+    :type filename: string
+    :param error: The exception and traceback returned by the job.
+    :type error: tuple
+    :returns: The exception.
+    :rtype: Exception
+    """
+    exception, trace = error
+    if DEBUG:
+        logger.error(trace)
+    logger.error('Exception reading file: %s', filename)
+    return exception
+
+
+def _get_render_cache():
+    """
+    Create the render cache from the settings.
+
+    The cache is invalidated when the version of ssg, or the Markdown
+    extensions change.
+
+    :return: The render cache, or None if caching is disabled.
+    :rtype: ssg.cache.RenderCache
+    """
+    if not SETTINGS['CACHE']:
+        logger.debug('Render cache disabled.')
+        return None
+    salt = __version__ + ':' + ','.join(MARKDOWN_EXTENSIONS)
+    return RenderCache(os.path.join(SETTINGS['ROOTDIR'],
+                                    SETTINGS['CACHEDIR'],
+                                    'render'),
+                       SETTINGS['CACHESIZE'],
+                       salt)
+
+
+def scan_content(path, context, content_files=None):
+    """
+    Create content from the meta data headers of all content files, without
+    converting the Markdown. This is fast, and leaves the context ready for
+    the sanity checks, and the generators.
+
+    :param path: Where the content files are at.
+    :type path: string
+    :param content_files: The content files, found in path if None.
+    :type content_files: list
+    :returns: The context.
+    """
+    logger.info("Scanning content.")
+    # Get list of files
+    if content_files is None:
+        content_files = get_snapshot(path).get_files('.md')
+    # Before starting any workers, so they get what is prepared
+    parsers_prepare(content_files)
+    for filename, content, error in _run_jobs(_scan_file, content_files,
+                                              content_files):
+        if error is not None:
+            raise _report_error(filename, error)
+        # Append the content to the list
+        context.contents.append(content)
+    return(context)
+
+
 def process_content(path, context):
     """
     Process all contents, converting it to HTML.
@@ -180,46 +499,57 @@ def process_content(path, context):
     *Metadata need to start at the first line of the file, and to have ONE
     newline before the content.*
 
+    Content is scanned using :func:`scan_content`, if it has not been
+    already. The HTML is added to the content in place, so generated pages
+    referring to the content will see it.
+
+    If the *JOBS* setting is larger than one, the files are converted by a
+    pool of worker processes.
+
+    Unless the *CACHE* setting is False, converted Markdown is kept in a
+    :class:`ssg.cache.RenderCache`, and unchanged files are not converted
+    again.
+
     :param path: Where the content files are at.
     :type path: string
     :returns: A list of contexts
     """
+    global RENDER_CACHE
+    if len(context.contents) == 0:
+        scan_content(path, context)
     logger.info("Processing content.")
-    # Get list of files
-    content_files = get_files(path, '.md')
-
+    RENDER_CACHE = _get_render_cache()
+    # Only content read from a file needs converting
+    contents = [content for content in context.contents
+                if content['metadata']['src_file'] != '']
+    filenames = [content['metadata']['src_file'] for content in contents]
     # Run through the files
-    for filename in content_files:
-        try:
-            # Open it
-            with codecs.open(filename, encoding='utf-8') as markdown_file:
-                logger.info("Reading: " + filename)
-                # Create an instance of the Markdown processor
-                md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS,
-                                       output_format='html5')
-                # Convert file to html
-                html_content = md.convert(markdown_file.read())
-                # Create meta data
-                metadata = _new_metadata(filename, md)
-                # Create content
-                content = dict()
-                # Add meta data
-                content['metadata'] = metadata
-                # Add content
-                content['content'] = html_content
-                # Run content filters on content
-                contentfilters.run(content)
-                # Append the content to the list
-                context.contents.append(content)
-        except Exception as exception:
-            if DEBUG:
-                logger.exception('Exception reading file: ' + filename)
-            else:
-                logger.error('Exception reading file: ' + filename)
-            raise exception
+    results = _run_jobs(_process_file, contents, filenames)
+    for content, (filename, result, error) in zip(contents, results):
+        if error is not None:
+            raise _report_error(filename, error)
+        # Results from workers are copies
+        content.update(result)
+    if RENDER_CACHE is not None:
+        RENDER_CACHE.prune()
     return(context)
 
 
+def _sanity_check(content):
+    """Check that the meta data of some content has the required keys.
+
+    :param content: The content to check.
+    :type content: dict
+    """
+    # Check if template is set
+    if 'template' not in content['metadata']:
+        raise ContentParserError('Missing template in: ' +
+                                 content['metadata']['src_file'])
+    if 'title' not in content['metadata']:
+        raise ContentParserError('Missing title in: ' +
+                                 content['metadata']['src_file'])
+
+
 def sanity_checks(context):
     """Checks to see if the templates and content actually parses.
 
@@ -228,62 +558,207 @@ def sanity_checks(context):
     """
     logger.debug("Running sanity checks on input.")
     for content in context.contents:
-        # Check if template is set
-        if 'template' not in content['metadata']:
-            raise ContentParserError('Missing template in: ' +
-                                     content['metadata']['src_file'])
-        if 'title' not in content['metadata']:
-            raise ContentParserError('Missing title in: ' +
-                                     content['metadata']['src_file'])
+        _sanity_check(content)
+
 
+def check():
+    """Check the meta data of all content files, without converting them.
 
-def apply_templates(path, context):
+    Every file is checked, and all errors are reported, before dying if any
+    were found.
+    """
+    logger.info('Checking content.')
+    content_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['CONTENTDIR'])
+    content_files = get_snapshot(content_path).get_files('.md')
+    parsers_prepare(content_files)
+    errors = 0
+    for filename, _, error in _run_jobs(_check_file, content_files,
+                                        content_files):
+        if error is not None:
+            logger.error('%s', _report_error(filename, error))
+            errors += 1
+    if errors > 0:
+        logger.error('%s of %s files have errors.', errors, len(content_files))
+        die()
+    logger.info('Checked %s files.', len(content_files))
+
+
+def compile_templates():
+    """
+    Compile the templates of the site to Python modules, which are used
+    instead of the templates until these change.
+    """
+    # Imported here, Jinja2 is only needed to render templates
+    from jinja2 import TemplateSyntaxError
+    from ssg import template
+    template_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['TEMPLATEDIR'])
+    try:
+        template.compile_templates(template_path)
+    except TemplateSyntaxError as exception:
+        logger.error('Jinja2 syntax error:')
+        logger.error('In %s line number :%s', exception.name, exception.lineno)
+        logger.error('%s', exception)
+        die()
+
+
+def dry_run():
+    """Report the files a build would delete from the output directory,
+    without writing anything.
+
+    The content is scanned, and the generators are run, to find the files the
+    build would write. Any other file written by the previous build, as
+    recorded in the build state, or the manifest, would be deleted.
+    """
+    global CONTEXT
+    logger.info('Dry run.')
+    CONTEXT.settings = SETTINGS
+    content_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['CONTENTDIR'])
+    output_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['OUTPUTDIR'])
+    state_file = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['STATEFILE'])
+    try:
+        CONTEXT = scan_content(content_path, CONTEXT)
+        sanity_checks(CONTEXT)
+        generators.run(CONTEXT)
+        previous_files = None
+        if not SETTINGS['BUILDSTATE']:
+            previous_files = writer.read_manifest(output_path)
+        elif os.path.isfile(state_file):
+            state = BuildState(state_file, SETTINGS['CHANGEDETECTION'])
+            try:
+                previous_files = state.get_outputs(output_path)
+            finally:
+                state.close()
+        writer.cleanup_destination(output_path,
+                                   writer.get_outputs(content_path, CONTEXT),
+                                   previous_files, True)
+    except Exception as exception:
+        logger.error('%s', exception)
+        if DEBUG:
+            raise exception
+        die()
+
+
+def _render_page(path, item):
+    """
+    Render the template of one page of the context.
+
+    If the *STREAM* setting is True, the page is written while it is
+    rendered, otherwise the HTML is returned.
+
+    :param path: Path to templates
+    :type path: string
+    :param item: Index of the content in the context, and the hash of the
+                 output file from the previous build, or None.
+    :type item: tuple
+    :returns: Keys to add to the content, and, when streaming, whether the
+              page was written.
+    :rtype: dict
+    """
+    # Imported here, Jinja2 is only needed to render templates
+    from ssg.template import get_environment, get_template_name
+    index, previous_hash = item
+    content = CONTEXT.contents[index]
+    template = get_template_name(content)
+    logger.debug('Using "%s" as template.', template)
+    pagereport.record(content, template=template)
+    # Get template
+    tpl = get_environment(path).get_template(template)
+    # Use default context if none is set
+    if 'context' in content.keys():
+        local_context = content['context']
+    else:
+        local_context = {'context': CONTEXT, 'content': content}
+    # Render template
+    if content['metadata']['src_file'] != '':
+        logger.info("Rendering %s", content['metadata']['src_file'])
+    logger.debug('Rendering template "%s" with "%s"', template,
+                 content['metadata']['src_file'])
+    if not SETTINGS['STREAM']:
+        with pagereport.measure(content, 'render_ms'):
+            return {'html': tpl.render(local_context)}
+    try:
+        # Convert the content just before rendering
+        if (content['metadata']['src_file'] != '' and
+                'content' not in content):
+            _load_content(content)
+        with pagereport.measure(content, 'render_ms'):
+            written = writer.stream_writer(content, tpl.stream(local_context),
+                                           previous_hash)
+    finally:
+        _free_content()
+    # Counted by the caller, which may be another process
+    return {'output_hash': content['output_hash'], 'written': written}
+
+
+def _report_template_error(content, error):
+    """
+    Log an error returned when rendering a page.
+
+    :param content: The content of the page.
+    :type content: dict
+    :param error: The exception and traceback returned by the job.
+    :type error: tuple
+    :returns: The exception.
+    :rtype: Exception
+    """
+    from jinja2 import TemplateSyntaxError, TemplateError
+    exception, trace = error
+    if DEBUG:
+        logger.error(trace)
+    if isinstance(exception, TemplateSyntaxError):
+        logger.error('Jinja2 syntax error:')
+        logger.error('In %s line number :%s', exception.name, exception.lineno)
+        logger.error('%s', exception.filename)
+    elif isinstance(exception, TemplateError):
+        logger.error('Jinja2 syntax error:')
+        logger.error('Template: %s', content['metadata']['template'])
+        logger.error('Destination: %s', content['metadata']['dst_file'])
+    return exception
+
+
+def apply_templates(path, context, plan=None):
     """
     Apply jinja2 templates to content, and write the files.
 
+    Content marked as not *updated* is skipped. If the *STREAM* setting is
+    True, each page is written while it is rendered, and its HTML is freed
+    afterwards. Content is converted just before rendering.
+
+    If the *JOBS* setting is larger than one, the pages are rendered by a
+    pool of worker processes. The workers get a copy of the context when
+    they start, and are only handed the index of each page.
+
     :param path: Path to templates
     :type path: string
     :param contents: A list of metadata, content tuples
     :type contents: list
+    :param plan: The plan of the build, if the build state is used.
+    :type plan: ssg.buildstate.BuildPlan
     :returns: List of contexts
     """
+    global CONTEXT
     logger.info('Applying templates.')
-    env = Environment(loader=FileSystemLoader(path))
-    # Run generator extensions
-    generators.run(context)
+    # The pages are rendered from the global context, also in the workers
+    CONTEXT = context
+    items = list()
+    filenames = list()
+    for index, content in enumerate(context.contents):
+        # Skip content that is not going to be written
+        if not content['metadata'].get('updated', True):
+            logger.debug('Not rendering: %s', content['metadata']['dst_file'])
+            continue
+        items.append((index, writer.get_previous_hash(content, plan)))
+        filenames.append(content['metadata']['dst_file'])
     # Run through all content
-    try:
-        for content in context.contents:
-            # Use specified template or index.html
-            if 'template' in content['metadata'].keys():
-                template = content['metadata']['template'] + '.html'
-            else:
-                template = 'page.html'
-            logger.debug('Using "' + template + '" as template.')
-            # Get template
-            tpl = env.get_template(template)
-            # Use default context if none is set
-            if 'context' in content.keys():
-                local_context = content['context']
-            else:
-                local_context = {'context': context, 'content': content}
-            # Render template
-            if content['metadata']['src_file'] != '':
-                logger.info("Rendering " + content['metadata']['src_file'])
-            logger.debug('Rendering template "' + template +
-                         '" with "' + content['metadata']['src_file'] + '"')
-            content['html'] = tpl.render(local_context)
-    except TemplateSyntaxError as exception:
-        logger.error('Jinja2 syntax error:')
-        logger.error('In ' + exception.name + ' line number :' +
-                     str(exception.lineno))
-        logger.error(exception.filename)
-        raise exception
-    except TemplateError as exception:
-        logger.error('Jinja2 syntax error:')
-        logger.error('Template: ' + content['metadata']['template'])
-        logger.error('Destination: ' + content['metadata']['dst_file'])
-        raise exception
+    results = _run_jobs(partial(_render_page, path), items, filenames,
+                        context)
+    for (index, _), (_, result, error) in zip(items, results):
+        content = context.contents[index]
+        if error is not None:
+            raise _report_template_error(content, error)
+        if 'written' in result:
+            writer.count_page(result.pop('written'))
+        content.update(result)
     return(context)
 
 
@@ -312,29 +787,91 @@ def run(update):
     :param update: Only write updated files.
     :type update: bool
     """
-    global CONTEXT, DEBUG
+    global CONTEXT, DEBUG, RENDER_CACHE
     # Add settings to global context
     CONTEXT.settings = SETTINGS
+    content_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['CONTENTDIR'])
+    template_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['TEMPLATEDIR'])
+    output_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['OUTPUTDIR'])
+    state = None
+    plan = None
+    content_files = None
+    # List the files again, they may have changed since the last run
+    forget_snapshots()
     try:
-        # Process the input files
-        CONTEXT = process_content(os.path.join(SETTINGS['ROOTDIR'],
-                                               SETTINGS['CONTENTDIR']),
-                                  CONTEXT)
+        if (SETTINGS['CHANGEDETECTION'] != 'mtime' and
+                not SETTINGS['BUILDSTATE']):
+            logger.warning('Change detection needs the build state, using '
+                           'modification times.')
+        if SETTINGS['BUILDSTATE']:
+            # Find out what changed since the last build
+            state = BuildState(os.path.join(SETTINGS['ROOTDIR'],
+                                            SETTINGS['STATEFILE']),
+                               SETTINGS['CHANGEDETECTION'])
+            with profiler.span('plan'):
+                plan = state.plan(content_path, template_path, output_path,
+                                  get_settings_hash(SETTINGS, __version__))
+            if update and plan.nothing_changed():
+                logger.info('Nothing to do.')
+                if len(plan.touched) > 0:
+                    state.save_stats(plan)
+                if (SETTINGS['PUBLISHDIR'] != '' and
+                        publish.get_current_release() is None):
+                    publish.publish(output_path)
+                return
+            content_files = plan.get_files('.md')
+        # Read the meta data of the input files
+        with profiler.span('scan_content'):
+            CONTEXT = scan_content(content_path, CONTEXT, content_files)
         # Template and content sanity checks
-        sanity_checks(CONTEXT)
-        # Apply the templates
-        CONTEXT = apply_templates(os.path.join(SETTINGS['ROOTDIR'],
-                                               SETTINGS['TEMPLATEDIR']),
-                                  CONTEXT)
+        with profiler.span('sanity_checks'):
+            sanity_checks(CONTEXT)
+        # Run generator extensions
+        with profiler.span('generators'):
+            generators.run(CONTEXT)
+        # Find the pages that needs to be written
+        with profiler.span('check_updated'):
+            writer.check_updated(CONTEXT, update, plan)
+        if SETTINGS['STREAM']:
+            # Convert, render, and write one page at a time
+            RENDER_CACHE = _get_render_cache()
+            with profiler.span('apply_templates'):
+                CONTEXT = apply_templates(template_path, CONTEXT, plan)
+            if RENDER_CACHE is not None:
+                with profiler.span('prune_cache'):
+                    RENDER_CACHE.prune()
+        else:
+            # Process the input files
+            with profiler.span('process_content'):
+                CONTEXT = process_content(content_path, CONTEXT)
+            # Apply the templates
+            with profiler.span('apply_templates'):
+                CONTEXT = apply_templates(template_path, CONTEXT)
         # Copy and write the output files
-        writer.write(os.path.join(SETTINGS['ROOTDIR'], SETTINGS['CONTENTDIR']),
-                     CONTEXT,
-                     update)
+        with profiler.span('write'):
+            written_files = writer.write(content_path, CONTEXT, update, plan)
+        if state is not None:
+            with profiler.span('save_state'):
+                state.save(plan, CONTEXT, written_files, output_path)
+        if SETTINGS['PUBLISHDIR'] != '':
+            with profiler.span('publish'):
+                publish.publish(output_path)
     except Exception as exception:
-        logger.error(str(exception))
+        logger.error('%s', exception)
         if DEBUG:
             raise exception
         die()
+    finally:
+        if state is not None:
+            state.close()
+
+
+def rollback():
+    """Publish the release before the current one again."""
+    if SETTINGS['PUBLISHDIR'] == '':
+        logger.error('Nothing is published, PUBLISHDIR is not set.')
+        die()
+    publish.rollback()
 
 
 def close():
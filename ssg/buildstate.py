@@ -0,0 +1,597 @@
+'''
+The build state records what the previous build did, in an SQLite database
+in the root of the site. Using it, a build only needs to look at what has
+changed since then:
+
+ - The listing of a content directory is reused, if the modification time of
+   the directory has not changed.
+ - Content files are compared to the size, modification time, and inode they
+   had at the previous build.
+ - If *CHANGEDETECTION* is ``'hash'``, files whose size, modification time, or
+   inode has changed are hashed, and are only considered changed if their
+   contents are. This keeps fresh checkouts, where every modification time is
+   new, from updating everything.
+ - Pages are only updated if their source, or one of the templates they use,
+   has changed. Generated pages are updated if the fingerprint of their
+   inputs has changed, see :func:`get_inputs`.
+ - The files written by the previous build are known, so the output directory
+   does not need to be scanned for files to delete.
+
+If nothing has changed, the build ends before any content is read.
+
+The build state does not notice changes made to the output directory by
+hand. Use ``--write-all`` to write everything again.
+'''
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import date, datetime
+from fnmatch import fnmatch
+from ssg.generator import PostSlice
+from ssg.log import logger
+from ssg.tools import get_snapshot, is_ignored
+
+
+IGNORED_SETTINGS = ('JOBS', 'CACHE', 'CACHEDIR', 'CACHESIZE', 'STREAM',
+                    'BUILDSTATE', 'STATEFILE', 'CHANGEDETECTION', 'MANIFEST',
+                    'IOJOBS', 'PUBLISHDIR', 'RELEASEDIR', 'RELEASES',
+                    'LOGFILE', 'LOGLEVEL', 'LOGQUEUE', 'REPORTPAGES')
+'''Settings that do not change the output of a build. *ASSETCOPY* is not one
+of them, changing it copies the assets again, so that no output file stays a
+hard link to its source.'''
+
+IGNORED_METADATA = ('updated',)
+'''Meta data keys that are not part of the fingerprint of a page.'''
+
+CHANGE_DETECTIONS = ('mtime', 'hash')
+'''Supported ways of detecting changed files.'''
+
+SCHEMA_VERSION = 5
+'''Version of the database tables. Older databases are discarded.'''
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    entries TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS templates (
+    name TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    dst_file TEXT PRIMARY KEY,
+    src_file TEXT,
+    src_hash TEXT,
+    templates TEXT,
+    out_hash TEXT,
+    inputs TEXT
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY
+);
+'''
+'''Tables of the build state database.'''
+
+
+def get_settings_hash(settings, version):
+    '''
+    Get a hash of the settings that change the output of a build.
+
+    :param settings: The settings of the site.
+    :type settings: dict
+    :param version: The version of ssg.
+    :type version: string
+    :return: The hash.
+    :rtype: string
+    '''
+    values = dict()
+    for key, value in settings.items():
+        if key not in IGNORED_SETTINGS:
+            values[key] = value
+    digest = hashlib.sha1(version.encode('utf-8'))
+    digest.update(json.dumps(values, sort_keys=True,
+                             default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_file_hash(filename):
+    '''
+    Get the hash of the contents of a file.
+
+    :param filename: The file.
+    :type filename: string
+    :return: The hash.
+    :rtype: string
+    '''
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as hash_file:
+        for block in iter(lambda: hash_file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _get_content_fingerprint(content, hashes, memo):
+    '''
+    Get a hash of the URL, meta data, and hash of the source file, of content
+    referred to by a generated page.
+
+    :param content: The content.
+    :type content: dict
+    :param hashes: Hash of each content file.
+    :type hashes: dict
+    :param memo: Fingerprints already made, by identity of the content, or
+                 None.
+    :type memo: dict
+    :rtype: string
+    '''
+    if memo is not None and id(content) in memo:
+        known, fingerprint = memo[id(content)]
+        if known is content:
+            return fingerprint
+    metadata = dict((key, item) for key, item in content['metadata'].items()
+                    if key not in IGNORED_METADATA)
+    value = json.dumps({'URL': content['metadata'].get('URL', ''),
+                        'metadata': _get_fingerprint_value(metadata, hashes,
+                                                           memo),
+                        'src_hash': hashes.get(
+                            content['metadata'].get('src_file', ''))},
+                       sort_keys=True)
+    fingerprint = hashlib.sha1(value.encode('utf-8')).hexdigest()
+    if memo is not None:
+        # Keep the content, so its identity is not reused
+        memo[id(content)] = (content, fingerprint)
+    return fingerprint
+
+
+def _get_fingerprint_value(value, hashes, memo=None):
+    '''
+    Get a value from the local context of a generated page, as something
+    that can be serialised the same way every time.
+
+    Content is replaced by a hash of its URL, meta data, and the hash of its
+    source file. Other objects, like the site context, are replaced by their
+    class name.
+
+    :param value: The value.
+    :param hashes: Hash of each content file.
+    :type hashes: dict
+    :param memo: Fingerprints of content already made, by identity, or None.
+    :type memo: dict
+    :return: The serialisable value.
+    '''
+    if isinstance(value, dict):
+        if 'metadata' in value:
+            return _get_content_fingerprint(value, hashes, memo)
+        return dict((str(key), _get_fingerprint_value(item, hashes, memo))
+                    for key, item in value.items())
+    if isinstance(value, (list, tuple, PostSlice)):
+        return [_get_fingerprint_value(item, hashes, memo) for item in value]
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return value.__class__.__name__
+
+
+def get_inputs(content, hashes, memo=None):
+    '''
+    Get a fingerprint of the inputs of a generated page. This is the URLs,
+    meta data, and source hashes, of the content it refers to in its local
+    context, in order, along with the other values there, and the meta data
+    of the page itself.
+
+    The hash of the source makes the page update when the text of content it
+    refers to changes, as the template may render it.
+
+    Content is listed by many pages, a memo keeps its fingerprint from being
+    made more than once. Content in the memo must not change.
+
+    :param content: The generated page.
+    :type content: dict
+    :param hashes: Hash of each content file, from the plan of the build.
+    :type hashes: dict
+    :param memo: Fingerprints of content already made, by identity, or None.
+    :type memo: dict
+    :return: A hash of the inputs, or None for pages read from a file.
+    :rtype: string
+    '''
+    if 'context' not in content:
+        return None
+    inputs = dict((key, value) for key, value in content['context'].items()
+                  if key not in ('context', 'content'))
+    metadata = dict((key, value)
+                    for key, value in content['metadata'].items()
+                    if key not in IGNORED_METADATA and key != 'date')
+    fingerprint = json.dumps([_get_fingerprint_value(metadata, hashes, memo),
+                              _get_fingerprint_value(inputs, hashes, memo)],
+                             sort_keys=True)
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+
+class BuildPlan(object):
+    '''
+    What has changed since the previous build.
+    '''
+    def __init__(self):
+        '''
+        Constructor.
+        '''
+        self.full = False
+        '''True if everything needs to be written.'''
+        self.files = list()
+        '''All files in the content directory.'''
+        self.stats = dict()
+        '''Size, modification time, and inode of each content file.'''
+        self.hashes = dict()
+        '''Hash of each content file, where known.'''
+        self.dirs = dict()
+        '''Modification time and entries of each content directory.'''
+        self.changed = set()
+        '''Content files that are new or have changed.'''
+        self.touched = set()
+        '''Content files with a new modification time, but same contents.'''
+        self.removed = set()
+        '''Content files that have been removed.'''
+        self.templates = dict()
+        '''Size, modification time, inode, and hash of each template.'''
+        self.templates_changed = set()
+        '''Names of templates that are new, have changed, or were removed.'''
+        self.pages = dict()
+        '''Pages written by the previous build, by destination file.'''
+        self.outputs = set()
+        '''Files written by the previous build.'''
+        self.outputs_recorded = False
+        '''True if the files written by the previous build are known.'''
+        self.settings_hash = None
+        '''Hash of the settings.'''
+
+    def get_files(self, extension):
+        '''
+        Get the content files with an extension, like
+        :func:`ssg.tools.get_files`.
+
+        :param extension: extension to look for
+        :type extension: string
+        :return: List of files.
+        :rtype: list
+        '''
+        return [filename for filename in self.files
+                if fnmatch(filename, '*' + extension)]
+
+    def nothing_changed(self):
+        '''
+        Check if anything has changed since the previous build.
+
+        :rtype: bool
+        '''
+        return not (self.full or self.changed or self.removed or
+                    self.templates_changed)
+
+
+class BuildState(object):
+    '''
+    Database of the state of the previous build.
+    '''
+    def __init__(self, filename, change_detection='mtime'):
+        '''
+        Constructor.
+
+        :param filename: Full path of the database.
+        :type filename: string
+        :param change_detection: How changed files are detected, 'mtime' or
+                                 'hash'.
+        :type change_detection: string
+        '''
+        if change_detection not in CHANGE_DETECTIONS:
+            raise ValueError('Unknown change detection: ' +
+                             str(change_detection))
+        self.hash_mode = change_detection == 'hash'
+        logger.debug('Opening build state: %s', filename)
+        self.connection = sqlite3.connect(filename)
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            logger.debug('Discarding build state version %s', version)
+            with self.connection:
+                for table in ('state', 'dirs', 'files', 'templates', 'pages',
+                              'outputs'):
+                    self.connection.execute('DROP TABLE IF EXISTS ' + table)
+            self.connection.execute('PRAGMA user_version = ' +
+                                    str(SCHEMA_VERSION))
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        '''
+        Close the database.
+        '''
+        self.connection.close()
+
+    def _get_value(self, key):
+        '''
+        Get a value from the state table.
+
+        :param key: The key of the value.
+        :type key: string
+        :return: The value or None.
+        '''
+        row = self.connection.execute('SELECT value FROM state WHERE key = ?',
+                                      (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def _check_file(self, filename, stat, recorded, always_hash=False):
+        '''
+        Check if a file has changed since it was recorded.
+
+        :param filename: The file.
+        :type filename: string
+        :param stat: Current size, modification time, and inode of the file.
+        :type stat: tuple
+        :param recorded: Recorded stat and hash, or None.
+        :type recorded: tuple
+        :param always_hash: Get the hash of the file, when it has changed,
+                            even if not comparing hashes.
+        :type always_hash: bool
+        :return: Whether the file changed, if only its stat changed, and the
+                 hash of the file, if known.
+        :rtype: tuple
+        '''
+        if recorded is not None and recorded[0] == stat:
+            return False, False, recorded[1]
+        file_hash = None
+        if self.hash_mode or always_hash:
+            file_hash = get_file_hash(filename)
+        if (self.hash_mode and recorded is not None and
+                recorded[1] == file_hash):
+            logger.debug('Unchanged contents: %s', filename)
+            return False, True, file_hash
+        logger.debug('Changed: %s', filename)
+        return True, False, file_hash
+
+    def _list_files(self, path, recorded_dirs, plan):
+        '''
+        List all files in a directory, and its sub directories, reusing the
+        recorded listing of directories that have not been modified.
+
+        :param path: The directory.
+        :type path: string
+        :param recorded_dirs: Directories recorded at the previous build.
+        :type recorded_dirs: dict
+        :param plan: The plan to add the directories to.
+        :type plan: ssg.buildstate.BuildPlan
+        :return: List of files.
+        :rtype: list
+        '''
+        files = list()
+        mtime_ns = os.stat(path).st_mtime_ns
+        recorded = recorded_dirs.get(path)
+        if recorded is not None and recorded[0] == mtime_ns:
+            entries = recorded[1]
+        else:
+            logger.debug('Listing: %s', path)
+            entries = list()
+            for entry in os.scandir(path):
+                # Ignore . and ..
+                if not entry.name.startswith('.'):
+                    entries.append((entry.name, entry.is_dir()))
+        plan.dirs[path] = (mtime_ns, entries)
+        for name, is_dir in entries:
+            if is_ignored(name):
+                continue
+            filename = path + '/' + name
+            if is_dir:
+                files.extend(self._list_files(filename, recorded_dirs, plan))
+            else:
+                files.append(filename)
+        return files
+
+    def get_outputs(self, output_path):
+        '''
+        Get the files written by the previous build.
+
+        :param output_path: Path to the output.
+        :type output_path: string
+        :return: The files, or None if no build has been recorded.
+        :rtype: set
+        '''
+        if self._get_value('settings') is None:
+            return None
+        return set(os.path.join(output_path, row[0]) for row in
+                   self.connection.execute('SELECT path FROM outputs'))
+
+    def plan(self, content_path, template_path, output_path, settings_hash):
+        '''
+        Find what has changed since the previous build.
+
+        :param content_path: Path to the content.
+        :type content_path: string
+        :param template_path: Path to the templates.
+        :type template_path: string
+        :param output_path: Path to the output.
+        :type output_path: string
+        :param settings_hash: Hash of the current settings.
+        :type settings_hash: string
+        :return: The plan for the build.
+        :rtype: ssg.buildstate.BuildPlan
+        '''
+        logger.debug('Planning build.')
+        plan = BuildPlan()
+        plan.settings_hash = settings_hash
+        if self._get_value('settings') != settings_hash:
+            logger.debug('Settings changed.')
+            plan.full = True
+        if not os.path.isdir(output_path):
+            logger.debug('No output directory.')
+            plan.full = True
+
+        # Find changed content
+        recorded_dirs = dict()
+        for path, mtime_ns, entries in self.connection.execute(
+                'SELECT path, mtime_ns, entries FROM dirs'):
+            recorded_dirs[path] = (mtime_ns, json.loads(entries))
+        plan.files = self._list_files(content_path, recorded_dirs, plan)
+        recorded_files = dict()
+        for path, size, mtime_ns, inode, file_hash in self.connection.execute(
+                'SELECT path, size, mtime_ns, inode, hash FROM files'):
+            recorded_files[path] = ((size, mtime_ns, inode), file_hash)
+        for filename in plan.files:
+            stat = os.stat(filename)
+            plan.stats[filename] = (stat.st_size, stat.st_mtime_ns,
+                                    stat.st_ino)
+            # Hash Markdown sources, they are read anyway
+            changed, touched, plan.hashes[filename] = self._check_file(
+                filename, plan.stats[filename], recorded_files.get(filename),
+                filename.endswith('.md'))
+            if changed:
+                plan.changed.add(filename)
+            elif touched:
+                plan.touched.add(filename)
+        plan.removed = set(recorded_files) - set(plan.files)
+
+        # Find changed templates
+        recorded_templates = dict()
+        for name, size, mtime_ns, inode, file_hash in self.connection.execute(
+                'SELECT name, size, mtime_ns, inode, hash FROM templates'):
+            recorded_templates[name] = ((size, mtime_ns, inode), file_hash)
+        templates = get_snapshot(template_path)
+        for filename in templates.get_files('.html'):
+            name = os.path.relpath(filename, template_path)
+            name = name.replace(os.sep, '/')
+            stat = templates.stat(filename)
+            stat = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            changed, _, file_hash = self._check_file(
+                filename, stat, recorded_templates.get(name))
+            plan.templates[name] = stat + (file_hash,)
+            if changed:
+                logger.debug('Changed template: %s', name)
+                plan.templates_changed.add(name)
+        plan.templates_changed.update(set(recorded_templates) -
+                                      set(plan.templates))
+
+        # Get what was written
+        for row in self.connection.execute(
+                'SELECT dst_file, src_file, src_hash, templates, out_hash, '
+                'inputs FROM pages'):
+            plan.pages[os.path.join(output_path, row[0])] = {
+                'src_file': row[1],
+                'src_hash': row[2],
+                'templates': json.loads(row[3]),
+                'out_hash': row[4],
+                'inputs': row[5]
+            }
+        outputs = self.get_outputs(output_path)
+        if outputs is not None:
+            plan.outputs = outputs
+            plan.outputs_recorded = True
+        if len(plan.outputs) == 0:
+            plan.full = True
+        logger.debug('%s changed, %s removed, %s changed templates.',
+                     len(plan.changed), len(plan.removed),
+                     len(plan.templates_changed))
+        return plan
+
+    def _save_stats(self, plan):
+        '''
+        Record the content directories, content files, and templates of a
+        plan.
+
+        :param plan: The plan of the build.
+        :type plan: ssg.buildstate.BuildPlan
+        '''
+        execute = self.connection.execute
+        executemany = self.connection.executemany
+        # Content directories
+        recorded_dirs = set(row[0] for row in
+                            execute('SELECT path FROM dirs'))
+        executemany('DELETE FROM dirs WHERE path = ?',
+                    ((path,) for path in recorded_dirs - set(plan.dirs)))
+        executemany('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)',
+                    ((path, mtime_ns, json.dumps(entries))
+                     for path, (mtime_ns, entries) in plan.dirs.items()))
+        # Content files
+        executemany('DELETE FROM files WHERE path = ?',
+                    ((path,) for path in plan.removed))
+        executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                    ((path,) + plan.stats[path] + (plan.hashes.get(path),)
+                     for path in plan.changed | plan.touched))
+        # Templates
+        execute('DELETE FROM templates')
+        executemany('INSERT INTO templates VALUES (?, ?, ?, ?, ?)',
+                    ((name,) + stat for name, stat in plan.templates.items()))
+
+    def save_stats(self, plan):
+        '''
+        Record new modification times of unchanged files, when nothing else
+        is saved, so they are not hashed again next time.
+
+        :param plan: The plan of the build.
+        :type plan: ssg.buildstate.BuildPlan
+        '''
+        with self.connection:
+            self._save_stats(plan)
+
+    def save(self, plan, context, written_files, output_path):
+        '''
+        Record the state of a finished build.
+
+        :param plan: The plan of the build.
+        :type plan: ssg.buildstate.BuildPlan
+        :param context: The site context.
+        :type context: ssg.context.Context
+        :param written_files: Files written, or kept, by the build.
+        :type written_files: list
+        :param output_path: Path to the output.
+        :type output_path: string
+        '''
+        logger.debug('Saving build state.')
+        with self.connection:
+            execute = self.connection.execute
+            executemany = self.connection.executemany
+            execute('INSERT OR REPLACE INTO state VALUES (?, ?)',
+                    ('settings', plan.settings_hash))
+            self._save_stats(plan)
+            # Pages
+            pages = list()
+            memo = dict()
+            for content in context.contents:
+                dst_file = content['metadata']['dst_file']
+                recorded = plan.pages.get(dst_file, dict())
+                src_file = content['metadata']['src_file']
+                templates = content.get('templates')
+                if templates is None:
+                    templates = recorded.get('templates')
+                pages.append((os.path.relpath(dst_file, output_path),
+                              src_file,
+                              plan.hashes.get(src_file),
+                              json.dumps(templates),
+                              content.get('output_hash',
+                                          recorded.get('out_hash')),
+                              get_inputs(content, plan.hashes, memo)))
+            execute('DELETE FROM pages')
+            executemany('INSERT OR REPLACE INTO pages VALUES '
+                        '(?, ?, ?, ?, ?, ?)', pages)
+            # Output files
+            outputs = set(os.path.relpath(filename, output_path)
+                          for filename in written_files)
+            recorded_outputs = set(os.path.relpath(filename, output_path)
+                                   for filename in plan.outputs)
+            executemany('DELETE FROM outputs WHERE path = ?',
+                        ((path,) for path in recorded_outputs - outputs))
+            executemany('INSERT INTO outputs VALUES (?)',
+                        ((path,) for path in outputs - recorded_outputs))
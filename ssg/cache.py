@@ -0,0 +1,130 @@
+'''
+Persistent cache of Markdown converted to HTML.
+
+Converting Markdown is the most expensive step when processing content. The
+render cache stores the HTML and the meta data produced by the Markdown
+processor on disk, keyed by a hash of the source file, the configured
+Markdown extensions, and the version of ssg. Unchanged files are read from
+the cache instead of being converted again.
+
+The cache lives in the *CACHEDIR* directory of the site, and is pruned to
+*CACHESIZE* bytes after each run, removing the least recently used entries
+first.
+'''
+import hashlib
+import json
+import os
+from ssg.log import logger
+
+
+class RenderCache(object):
+    '''
+    On disk cache of converted Markdown.
+    '''
+    def __init__(self, path, max_size, salt=''):
+        '''
+        Constructor.
+
+        :param path: Directory to keep the cache entries in.
+        :type path: string
+        :param max_size: Maximum size of the cache in bytes.
+        :type max_size: int
+        :param salt: String mixed into every key, to invalidate all entries
+                     when the way content is converted changes.
+        :type salt: string
+        '''
+        self.path = path
+        self.max_size = max_size
+        self.salt = salt.encode('utf-8')
+
+    def key(self, source):
+        '''
+        Get the cache key of a source file.
+
+        :param source: The raw bytes of the source file.
+        :type source: bytes
+        :return: The key.
+        :rtype: string
+        '''
+        digest = hashlib.sha1(self.salt)
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        '''
+        Get the path of the file holding a cache entry.
+
+        :param key: The key of the entry.
+        :type key: string
+        '''
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def get(self, key):
+        '''
+        Get an entry from the cache.
+
+        :param key: The key of the entry.
+        :type key: string
+        :return: HTML and Markdown meta data, or None if not cached.
+        :rtype: tuple
+        '''
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, encoding='utf-8') as entry_file:
+                entry = json.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.debug('Ignoring broken cache entry: %s', entry_path)
+            return None
+        # Mark the entry as recently used
+        os.utime(entry_path)
+        return entry['html'], entry['meta']
+
+    def put(self, key, html, meta):
+        '''
+        Add an entry to the cache.
+
+        :param key: The key of the entry.
+        :type key: string
+        :param html: The HTML converted from the source.
+        :type html: string
+        :param meta: The meta data found by the Markdown processor.
+        :type meta: dict
+        '''
+        entry_path = self._entry_path(key)
+        entry_dir, _ = os.path.split(entry_path)
+        os.makedirs(entry_dir, mode=0o755, exist_ok=True)
+        # Write to a temporary file first, other processes may be reading
+        tmp_path = entry_path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as entry_file:
+            json.dump({'html': html, 'meta': meta}, entry_file)
+        os.replace(tmp_path, entry_path)
+
+    def prune(self):
+        '''
+        Remove the least recently used entries, until the cache is no larger
+        than its maximum size.
+        '''
+        if not os.path.isdir(self.path):
+            return
+        entries = list()
+        size = 0
+        for entry_dir in os.scandir(self.path):
+            if not entry_dir.is_dir():
+                continue
+            for entry in os.scandir(entry_dir.path):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                size += stat.st_size
+        logger.debug('Render cache size: %s bytes.', size)
+        if size <= self.max_size:
+            return
+        # Oldest first
+        entries.sort()
+        for _, entry_size, entry_path in entries:
+            if size <= self.max_size:
+                break
+            logger.debug('Evicting: %s', entry_path)
+            os.remove(entry_path)
+            size -= entry_size
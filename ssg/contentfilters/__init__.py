@@ -2,15 +2,18 @@
 from ssg.contentfilter import CONTENTFILTERS
 from ssg.settings import SETTINGS
 from ssg.log import logger
-
-# Add generators here
-import ssg.contentfilters.localurl
+from ssg import plugins
+from ssg import profiler
 
 
 def run(content):
     '''Run all active parsers.'''
+    plugins.load('contentfilters', SETTINGS['CONTENTFILTERS'],
+                 CONTENTFILTERS)
     logger.debug("Running content filters.")
     # Run through extra meta data parsers.
     for generator in CONTENTFILTERS:
         if generator.__class__.__name__ in SETTINGS['CONTENTFILTERS']:
-            generator.run(content)
+            with profiler.span(generator.__class__.__name__,
+                               'contentfilter'):
+                generator.run(content)
@@ -40,13 +40,13 @@ class LocalURL(contentfilter.ContentFilterBase):
         logger.debug('Checking content for stray dollars')
         n_line = 1
         for line in content.split('\n'):
-            logger.debug('Template line {}: {}'.format(n_line, line))
+            logger.debug('Template line %s: %s', n_line, line)
             index = line.find('$')
             while index is not -1:
-                logger.debug('Dollar at {}: {}'.format(index, line[index:]))
+                logger.debug('Dollar at %s: %s', index, line[index:])
                 if (line.find('LOCALURL', index, index+9)) is -1 and (line.find('$', index + 1, index + 2) is -1):
-                       logger.debug('Single dollar at {}: {}'.format(index, line[index-2:]))
-                       logger.error('Single $ character detected in line {},{}: "{}"'.format(n_line, index, line))
+                       logger.debug('Single dollar at %s: %s', index, line[index-2:])
+                       logger.error('Single $ character detected in line %s,%s: "%s"', n_line, index, line)
                        raise MissingDollarError('Stray single dollar character')
                 else:
                     index += 2
@@ -64,13 +64,13 @@ class LocalURL(contentfilter.ContentFilterBase):
         '''
         logger.debug('Running LocalURL extension.')
         localURL, _ = os.path.split(content['metadata']['URL'])
-        logger.debug('Local URL: ' + localURL)
+        logger.debug('Local URL: %s', localURL)
         self.__check_tmpl_vars(content['content'])
         try:
             tmpl = Template(content['content'])
             content['content'] = tmpl.substitute(LOCALURL=localURL)
         except KeyError as exception:
-            logger.error('Could not find key ' + str(exception) + '.')
+            logger.error('Could not find key %s.', exception)
             logger.error('Maybe a missing $ character.')
             raise exception
 
@@ -11,6 +11,10 @@ settings
 contents
    A list of all content.
 
+index
+   The :class:`ssg.siteindex.SiteIndex` of the content, built before the
+   generators run.
+
 
 Keys in contents
 ----------------
@@ -26,6 +30,20 @@ html
 
 context
     Local context used by Jinja2, when rendering the page.
+
+templates
+    Names of the templates used to render the page, following ``extends``,
+    ``include``, and ``import``. None if they are only known when rendering.
+
+
+Streaming
+---------
+
+When the *STREAM* setting is True, pages are written to the output directory
+while they are rendered. The HTML of content is converted just before its
+page is rendered, and is freed again afterwards. Neither *content* nor
+*html* are kept. If a generated page uses the *content* of a page that has
+been freed, it is converted again when accessed.
 '''
 
 
@@ -38,6 +56,8 @@ class Context(object):
     '''List of all content.'''
     settings = None
     '''Settings for the site.'''
+    index = None
+    '''Index of the content, see :class:`ssg.siteindex.SiteIndex`.'''
     def __init__(self):
         '''
         Constructor
@@ -45,4 +65,28 @@ class Context(object):
         self.contents = list()
 
 
+class Content(dict):
+    '''
+    Dictionary holding content read from a file.
+
+    Accessing the *content* key, after the HTML has been freed, converts the
+    content again using :attr:`loader`.
+    '''
+
+    loader = None
+    '''Function called with the content to add the *content* key.'''
+
+    def __missing__(self, key):
+        '''
+        Load the HTML of the content, if it is missing.
+
+        :param key: The missing key.
+        :type key: string
+        '''
+        if key != 'content' or Content.loader is None:
+            raise KeyError(key)
+        Content.loader(self)
+        return dict.__getitem__(self, key)
+
+
 CONTEXT = Context()
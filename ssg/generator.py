@@ -1,12 +1,80 @@
 '''
 A generator passes its output to the Jinja2 for rendering. A generator can
 programmatically generate a page, like a global ``index.html``.
+
+Generators splitting a list of posts over several pages, use
+:func:`paginate`, which returns a :class:`PostSlice` for each page. Slices
+refer to the original list, instead of copying it.
 '''
+from collections.abc import Sequence
 from ssg.log import logger
 GENERATORS = list()
 '''List of active generators.'''
 
 
+class PostSlice(Sequence):
+    '''
+    A part of a list of posts, that does not copy the list.
+    '''
+    def __init__(self, posts, start, stop):
+        '''
+        Constructor.
+
+        :param posts: The list of posts.
+        :type posts: list
+        :param start: Index of the first post in the slice.
+        :type start: int
+        :param stop: Index after the last post in the slice.
+        :type stop: int
+        '''
+        self.posts = posts
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        '''
+        Get the number of posts in the slice.
+        '''
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        '''
+        Get a post, or a slice of the slice.
+
+        :param index: Index in the slice, or a slice object.
+        '''
+        indices = range(self.start, self.stop)[index]
+        if isinstance(index, slice):
+            if indices.step == 1:
+                return PostSlice(self.posts, indices.start, indices.stop)
+            return [self.posts[i] for i in indices]
+        return self.posts[indices]
+
+    def __iter__(self):
+        '''
+        Iterate over the posts in the slice.
+        '''
+        for i in range(self.start, self.stop):
+            yield self.posts[i]
+
+
+def paginate(posts, per_page=None):
+    '''
+    Split a list of posts into pages.
+
+    :param posts: The list of posts.
+    :type posts: list
+    :param per_page: Number of posts on each page, or None for one page.
+    :type per_page: int
+    :return: The posts of each page. Always at least one page.
+    :rtype: list
+    '''
+    if per_page is None or per_page < 1 or len(posts) <= per_page:
+        return [posts]
+    return [PostSlice(posts, start, min(start + per_page, len(posts)))
+            for start in range(0, len(posts), per_page)]
+
+
 class GeneratorBase(object):
     '''
     Base class for all generators.
@@ -1,18 +1,19 @@
 '''Running of the generator extensions.'''
 from ssg.generator import GENERATORS
 from ssg.settings import SETTINGS
+from ssg.siteindex import SiteIndex
 from ssg.log import logger
-
-# Add generators here
-import ssg.generators.blogindex
-import ssg.generators.categoryindex
-import ssg.generators.tagcloud
+from ssg import plugins
+from ssg import profiler
 
 
 def run(context):
-    '''Run all active parsers.'''
+    '''Build the site index, and run all active generators.'''
+    context.index = SiteIndex(context.contents)
+    plugins.load('generators', SETTINGS['GENERATORS'], GENERATORS)
     logger.debug("Running generators.")
     # Run through extra meta data parsers.
     for generator in GENERATORS:
         if generator.__class__.__name__ in SETTINGS['GENERATORS']:
-            generator.run(context)
+            with profiler.span(generator.__class__.__name__, 'generator'):
+                generator.run(context)
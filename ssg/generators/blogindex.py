@@ -8,7 +8,9 @@ fly.
 Adds a list of post to the Jinja2 context, called 'posts'.
 Adds keys 'page', and 'pages' to the metadata of the indices. 'page' is the
 current page, anmd 'pages' is the total number of pages.
-Content is sorted by date.
+Posts are taken from the site index, sorted by date. The content of the site
+is sorted by date too, newest first, for templates, and generators, using
+``context.contents``.
 
 Adds the config key "POSTSPERINDEX", to set the number of posts per index page.
 If 'POSTSPERINDEX' is not defined, 'pages' and 'n_pages' equals zero.
@@ -18,7 +20,18 @@ from datetime import datetime
 from ssg import generator
 from ssg.log import logger
 from ssg.settings import SETTINGS
-from ssg.metadata import ishidden
+
+
+def _get_date_key(content):
+    '''Get the key sorting content by date.
+
+    :param content: The content.
+    :type content: dict
+    :rtype: tuple
+    '''
+    if 'date' not in content['metadata']:
+        return (False,)
+    return (True, content['metadata']['date'])
 
 
 class BlogIndexGenerator(generator.GeneratorBase):
@@ -59,7 +72,7 @@ class BlogIndexGenerator(generator.GeneratorBase):
         content['metadata'] = metadata
         # Empty content
         content['content'] = ''
-        logger.debug('Autogenerated content: ' + str(content))
+        logger.debug('Autogenerated content: %s', content)
         # Add contents to context
         return content
 
@@ -112,60 +125,48 @@ class BlogIndexGenerator(generator.GeneratorBase):
         '''
         logger.debug('Running BlogIndexGenerator extension.')
         content = self._set_template_post(context)
-        # Sort by date
-        context.contents = sorted(context.contents,
-                                  key=lambda c: c['metadata']['date'],
+        # Sort by date, newest first, and content without a date last
+        context.contents = sorted(context.contents, key=_get_date_key,
                                   reverse=True)
+        # Visible posts sorted by date
+        index_posts = context.index.posts
 
         page = 0
         n_pages = 0
         # Check if we're supposed to use pagination
         if 'POSTSPERINDEX' in SETTINGS.keys():
-            logger.debug(str(SETTINGS['POSTSPERINDEX']) + ' post per page.')
+            logger.debug('%s post per page.', SETTINGS['POSTSPERINDEX'])
             # Get number of pages
-            n_pages = 0
-            for content in context.contents:
-                # Only do posts
-                if content['metadata']['template'] == 'post':
-                    if not ishidden(content['metadata']):
-                        n_pages += 1
             # TODO: Check for rounding error when result is something
             # like x,1-4
-            n_pages = int(n_pages / SETTINGS['POSTSPERINDEX'])
-            logger.debug('Index spans ' + str(n_pages) + ' pages.')
+            n_pages = int(len(index_posts) / SETTINGS['POSTSPERINDEX'])
+            logger.debug('Index spans %s pages.', n_pages)
             # Keep track of the page number
             page = 1
             # Create a list of posts
             posts = list()
-            # Run trough all content
-            for content in context.contents:
-                # Only do posts
-                if ((content['metadata']['template'] == 'post') and
-                    (not ishidden(content['metadata']))):
-                    # Split by 'POSTSPERINDEX', and create indices
-                    if len(posts) <= SETTINGS['POSTSPERINDEX']:
-                        logger.debug('Adding post to page ' + str(page) + ' ' +
-                                     content['metadata']['title'])
-                        posts.append(content)
-                    else:
-                        self._create_index(context,
-                                           page,
-                                           n_pages,
-                                           posts)
-                        # Generate an index.html as well as an index1.html
-                        if page == 1:
-                            self._create_index(context, 0, n_pages, posts)
-                        page += 1
-                        # New posts list
-                        posts = list()
-                        posts.append(content)
+            # Run trough all posts
+            for content in index_posts:
+                # Split by 'POSTSPERINDEX', and create indices
+                if len(posts) <= SETTINGS['POSTSPERINDEX']:
+                    logger.debug('Adding post to page %s %s', page,
+                                 content['metadata']['title'])
+                    posts.append(content)
                 else:
-                    logger.debug('Skipping ' +
-                                 content['metadata']['src_file'])
+                    self._create_index(context,
+                                       page,
+                                       n_pages,
+                                       posts)
+                    # Generate an index.html as well as an index1.html
+                    if page == 1:
+                        self._create_index(context, 0, n_pages, posts)
+                    page += 1
+                    # New posts list
+                    posts = list()
+                    posts.append(content)
             # Get any remaining posts
             if len(posts) > 0:
-                logger.debug('Last page is ' + str(len(posts)) +
-                             'posts long.')
+                logger.debug('Last page is %sposts long.', len(posts))
                 self._create_index(context,
                                    page,
                                    n_pages,
@@ -176,15 +177,8 @@ class BlogIndexGenerator(generator.GeneratorBase):
         else:
             logger.debug('No pagination.')
             # Create a list of posts
-            posts = list()
-            # Run trough all content
-            for content in context.contents:
-                # Only do posts
-                if ((content['metadata']['template'] == 'post') and
-                    (not ishidden(content['metadata']))):
-                    logger.debug('Adding post to index page.')
-                    posts.append(content)
-
+            posts = list(index_posts)
+            logger.debug('Adding %s posts to index page.', len(posts))
             self._create_index(context,
                                page,
                                n_pages,
@@ -19,13 +19,20 @@ Reserved meta data keywords
 
 catfile
     Name of the category index file.
+
+Adds the config key "POSTSPERCATEGORYINDEX", to set the number of posts per
+category index page. Pages after the first are named like
+``cat_blog-python_index2.html``. When it is defined, the keys 'page', and
+'pages' are added to the meta data of the category indices, along with
+'pagefiles', the file names of all the pages of the category.
+If 'POSTSPERCATEGORYINDEX' is not defined, all posts are on one page, and
+these keys are not added.
 '''
 import os
 from datetime import datetime
 from ssg import generator
 from ssg.log import logger
 from ssg.settings import SETTINGS
-from ssg.metadata import ishidden
 
 
 class CategoryIndexGenerator(generator.GeneratorBase):
@@ -58,33 +65,46 @@ class CategoryIndexGenerator(generator.GeneratorBase):
         content['metadata'] = metadata
         # Empty content
         content['content'] = ''
-        logger.debug('Autogenerated content: ' + str(content))
+        logger.debug('Autogenerated content: %s', content)
         # Add contents to context
         return(content)
 
     def _create_category_index(self, context, posts, category):
-        '''Create an catindex.html from a context.
+        '''Create the index pages of a category from a context.
 
         :param context:
         :type context:
         :param posts: List of posts in the index.
         :type posts: list
+        :return: File name of the first page.
+        :rtype: string
         '''
-        logger.debug('Creating categories page for:' + category)
-        index = self._create_index_metadata()
-        index['metadata']['dst_file'] = os.path.join(SETTINGS['ROOTDIR'],
-                                                     SETTINGS['OUTPUTDIR'])
-        index['metadata']['dst_file'] += ('/cat_' + category.replace('/', '-')
-                                          + '_index.html')
-        index['metadata']['title'] = 'Category index: ' + category
-        index['metadata']['template'] = 'category'
-        # Add local context
-        index['context'] = {'context': context,
-                            'posts': posts,
-                            'content': index}
-
-        context.contents.append(index)
-        return('/cat_' + category.replace('/', '-') + '_index.html')
+        logger.debug('Creating categories page for:%s', category)
+        name = '/cat_' + category.replace('/', '-') + '_index'
+        per_page = SETTINGS.get('POSTSPERCATEGORYINDEX')
+        pages = generator.paginate(posts, per_page)
+        # Number the pages after the first
+        pagefiles = [name + '.html']
+        for page in range(2, len(pages) + 1):
+            pagefiles.append(name + str(page) + '.html')
+        for page, page_posts in enumerate(pages):
+            index = self._create_index_metadata()
+            index['metadata']['dst_file'] = os.path.join(SETTINGS['ROOTDIR'],
+                                                         SETTINGS['OUTPUTDIR'])
+            index['metadata']['dst_file'] += pagefiles[page]
+            index['metadata']['title'] = 'Category index: ' + category
+            index['metadata']['template'] = 'category'
+            if per_page is not None:
+                index['metadata']['page'] = page + 1
+                index['metadata']['pages'] = len(pages)
+                index['metadata']['pagefiles'] = pagefiles
+            # Add local context
+            index['context'] = {'context': context,
+                                'posts': page_posts,
+                                'content': index}
+
+            context.contents.append(index)
+        return(pagefiles[0])
 
     def run(self, context):
         '''Run the generator.
@@ -95,44 +115,26 @@ class CategoryIndexGenerator(generator.GeneratorBase):
         logger.debug('Running CategoryIndexGenerator extension.')
 
         categories = dict()
-        # Run through all content and create a list of cetegories
-        for content in context.contents:
-            # Only posts that are not  hidden
-            if content['metadata']['template'] == 'post':
-                if ishidden(content['metadata']):
-                    logger.debug('Hiding: ' + content['metadata']['title'])
-                else:
-                    if 'category' in content['metadata']:
-                        # Generate category name
-                        category = '/'.join(content['metadata']['category'])
-                        # Check if it is already created
-                        if category in categories:
-                            # Increase post count and add post to the category
-                            categories[category]['items'] += 1
-                            categories[category]['posts'].append(content)
-                        else:
-                            # Create a new category and add post
-                            logger.debug('Adding: ' + category)
-                            categories[category] = dict()
-                            categories[category]['items'] = 1
-                            categories[category]['posts'] = list()
-                            categories[category]['posts'].append(content)
+        # Create a list of categories from the site index
+        for category, posts in context.index.categories.items():
+            logger.debug('Adding: %s', category)
+            categories[category] = dict()
+            categories[category]['items'] = len(posts)
+            categories[category]['posts'] = posts
         # Assign index file names to categories.
         for category, data in categories.items():
             categories[category]['filename'] = self._create_category_index(context,
                                                data['posts'],
                                                category)
-            logger.debug('Assigning filename to category: ' + categories[category]['filename'])
+            logger.debug('Assigning filename to category: %s',
+                         categories[category]['filename'])
 
         # Assign index file names to posts.
-        for content in context.contents:
-            # Only posts that are not  hidden
-            if content['metadata']['template'] == 'post':
-                if not ishidden(content['metadata']):
-                    logger.debug('Assigning filename to post: ' +
-                                 content['metadata']['title'])
-                    filename = categories['/'.join(content['metadata']['category'])]['filename']
-                    content['metadata']['catfile'] = filename
+        for content in context.index.posts:
+            logger.debug('Assigning filename to post: %s',
+                         content['metadata']['title'])
+            filename = categories[context.index.get_category(content)]['filename']
+            content['metadata']['catfile'] = filename
         logger.debug('Creating category page.')
         index = self._create_index_metadata()
         # Add local context
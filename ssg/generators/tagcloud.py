@@ -17,13 +17,20 @@ Reserved meta data keywords
 
 tagfiles
     Dictionary of index file names for each tag.
+
+Adds the config key "POSTSPERTAGINDEX", to set the number of posts per tag
+index page. Pages after the first are named like ``tag_python_index2.html``.
+When it is defined, the keys 'page', and 'pages' are added to the meta data
+of the tag indices, along with 'pagefiles', the file names of all the pages
+of the tag.
+If 'POSTSPERTAGINDEX' is not defined, all posts are on one page, and these
+keys are not added.
 '''
 import os
 from datetime import datetime
 from ssg import generator
 from ssg.log import logger
 from ssg.settings import SETTINGS
-from ssg.metadata import ishidden
 
 
 class TagCloudGenerator(generator.GeneratorBase):
@@ -55,37 +62,50 @@ class TagCloudGenerator(generator.GeneratorBase):
         content['metadata'] = metadata
         # Empty content
         content['content'] = ''
-        logger.debug('Autogenerated content: ' + str(content))
+        logger.debug('Autogenerated content: %s', content)
         # Add contents to context
         return(content)
 
     def _create_tag_index(self, context, posts, tag):
-        '''Create a tag index from a context.
+        '''Create the tag index pages of a tag from a context.
 
         :param context:
         :type context:
         :param posts: List of posts in the index.
         :type posts: list
+        :return: File name of the first page.
+        :rtype: string
         '''
-        logger.debug('Creating tag cloud page for:' + tag)
+        logger.debug('Creating tag cloud page for:%s', tag)
         # Generate tag index filename from tag
-        dst_file = tag.replace(' ', '_')
-        dst_file = '/tag_' + dst_file.replace('/', '-') + '_index.html'
-        # Create meta data
-        index = self._create_index_metadata()
-        # Adjust meta data for the tag index template
-        index['metadata']['dst_file'] = os.path.join(SETTINGS['ROOTDIR'],
-                                                     SETTINGS['OUTPUTDIR'])
-        index['metadata']['dst_file'] += dst_file
-        index['metadata']['title'] = 'Tag index: ' + tag
-        index['metadata']['template'] = 'tag'
-        # Add local context
-        index['context'] = {'context': context,
-                            'posts': posts,
-                            'content': index}
-
-        context.contents.append(index)
-        return(dst_file)
+        name = tag.replace(' ', '_')
+        name = '/tag_' + name.replace('/', '-') + '_index'
+        per_page = SETTINGS.get('POSTSPERTAGINDEX')
+        pages = generator.paginate(posts, per_page)
+        # Number the pages after the first
+        pagefiles = [name + '.html']
+        for page in range(2, len(pages) + 1):
+            pagefiles.append(name + str(page) + '.html')
+        for page, page_posts in enumerate(pages):
+            # Create meta data
+            index = self._create_index_metadata()
+            # Adjust meta data for the tag index template
+            index['metadata']['dst_file'] = os.path.join(SETTINGS['ROOTDIR'],
+                                                         SETTINGS['OUTPUTDIR'])
+            index['metadata']['dst_file'] += pagefiles[page]
+            index['metadata']['title'] = 'Tag index: ' + tag
+            index['metadata']['template'] = 'tag'
+            if per_page is not None:
+                index['metadata']['page'] = page + 1
+                index['metadata']['pages'] = len(pages)
+                index['metadata']['pagefiles'] = pagefiles
+            # Add local context
+            index['context'] = {'context': context,
+                                'posts': page_posts,
+                                'content': index}
+
+            context.contents.append(index)
+        return(pagefiles[0])
 
     def run(self, context):
         '''Run the generator.
@@ -96,37 +116,22 @@ class TagCloudGenerator(generator.GeneratorBase):
         logger.debug('Running TagCloudGenerator extension.')
 
         tags = dict()
-        # Run through all content and create a dict of tags
-        for content in context.contents:
-            logger.debug(content['metadata']['title'])
-            # Skip pages or hidden
-            if content['metadata']['template'] == 'post':
-                if ishidden(content['metadata']):
-                    logger.debug('Hiding.')
-                else:
-                    if 'tags' in content['metadata']:
-                        # Run through tags
-                        for tag in content['metadata']['tags'].split(','):
-                            tag = tag.strip().lower()
-                            if tag in tags:
-                                tags[tag]['items'] += 1
-                                tags[tag]['posts'].append(content)
-                            else:
-                                logger.debug('Adding: ' + tag)
-                                tags[tag] = dict()
-                                tags[tag]['items'] = 1
-                                tags[tag]['posts'] = list()
-                                tags[tag]['posts'].append(content)
+        # Create a dict of tags from the site index
+        for tag, posts in context.index.tags.items():
+            logger.debug('Adding: %s', tag)
+            tags[tag] = dict()
+            tags[tag]['items'] = len(posts)
+            tags[tag]['posts'] = posts
 
         # Get maximum number of tags
         max_tags = 1
         for tag in tags.values():
             if max_tags < tag['items']:
                 max_tags = tag['items']
-        logger.debug('Most used tag used: ' + str(max_tags))
+        logger.debug('Most used tag used: %s', max_tags)
         # Calculate the tag scale factor to get it in 1-10 range.
         tag_scale = 10 / max_tags
-        logger.debug('Tag scaling: ' + str(tag_scale))
+        logger.debug('Tag scaling: %s', tag_scale)
         # Normalise use range
         for tag in tags.values():
             tag['items'] = int(tag['items'] * tag_scale)
@@ -139,18 +144,10 @@ class TagCloudGenerator(generator.GeneratorBase):
         for content in context.contents:
             # Dictionary to hold the filenames
             filelist = dict()
-            # Only posts that are not hidden
-            if content['metadata']['template'] == 'post':
-                if not ishidden(content['metadata']):
-                    logger.debug('Assigning filename to post: ' +
-                                 content['metadata']['title'])
-                    # Run through all tags
-                    if 'tags' in content['metadata']:
-                        for tag in content['metadata']['tags'].split(','):
-                            tag = tag.lower().strip()
-                            filelist[tag] = tags[tag]['filename']
-                            logger.debug('"' + tags[tag]['filename'] + '"' +
-                                         ' for tag: ' + tag)
+            # Only visible posts have tags in the index
+            for tag in context.index.get_tags(content):
+                filelist[tag] = tags[tag]['filename']
+                logger.debug('"%s" for tag: %s', tags[tag]['filename'], tag)
             # Assign the file names to the post meta data
             content['metadata']['tagfiles'] = filelist
 
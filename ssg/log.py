@@ -1,11 +1,20 @@
 '''
 Log module.
 
+Messages are formatted lazily, using ``%`` style arguments, so messages below
+the level of every handler cost next to nothing.
+
+The file log is only opened by :func:`init_file_log`, and can be turned off.
+With the queue mode, the handlers run in a thread of their own, and logging
+a message only formats it, and puts it on a queue.
+
 :since: 22 Aug 2011
 :author: oblivion
 '''
 from logging import handlers
 import logging
+import os
+import queue
 import sys
 
 
@@ -14,26 +23,62 @@ logger = logging.getLogger("ssg")
 
 logger.setLevel(logging.DEBUG)
 
-file_log = handlers.RotatingFileHandler("ssg.log",
-                                       maxBytes=10000000,
-                                       backupCount=5)
-'''Handler for logging to a file.'''
-
-file_log.setLevel(logging.DEBUG)
-file_log.setFormatter(logging.Formatter('%(asctime)s - %(filename)s - %(funcName)s - %(levelname)s: %(message)s'))
-logger.addHandler(file_log)
-file_log.doRollover()
+file_log = None
+'''Handler for logging to a file, if enabled.'''
 
 console_log = logging.StreamHandler(sys.stdout)
 '''Handler for logging to the console.'''
 
-def init_file_log(level=logging.DEBUG):
-    '''Initialise the file logging.
+queue_log = None
+'''Handler putting messages on the queue, in queue mode.'''
+
+queue_listener = None
+'''Listener handling the messages on the queue, in queue mode.'''
+
+
+def _get_handlers():
+    '''Get the handlers doing the logging.
+
+    :rtype: list
+    '''
+    log_handlers = [console_log]
+    if file_log is not None:
+        log_handlers.append(file_log)
+    return log_handlers
+
+
+def _set_level():
+    '''Set the level of the logger to the lowest level of the handlers, so
+    that messages no handler wants are dropped right away.
+    '''
+    logger.setLevel(min(handler.level for handler in _get_handlers()))
+
+
+def init_file_log(level=logging.DEBUG, filename='ssg.log'):
+    '''Initialise the file logging. The previous log is rolled over to a
+    backup.
 
     :param level: The level at which the message is logged to the file.
     :type level: logging level
+    :param filename: Name of the log file, or an empty string to not log to a
+                     file.
+    :type filename: string
     '''
+    global file_log
+    if filename == '':
+        return
+    file_log = handlers.RotatingFileHandler(filename, maxBytes=10000000,
+                                           backupCount=5, delay=True)
     file_log.setLevel(level)
+    file_log.setFormatter(logging.Formatter('%(asctime)s - %(filename)s - %(funcName)s - %(levelname)s: %(message)s'))
+    # Only roll over a log that has something in it
+    if os.path.isfile(filename) and os.path.getsize(filename) > 0:
+        file_log.doRollover()
+    if queue_log is None:
+        logger.addHandler(file_log)
+    else:
+        queue_listener.handlers = tuple(_get_handlers())
+    _set_level()
 
 
 class ConsoleFormatter(logging.Formatter):
@@ -66,9 +111,72 @@ def init_console_log(level=logging.INFO):
     console_log.setLevel(level)
     console_log.setFormatter(ConsoleFormatter())
     logger.addHandler(console_log)
+    _set_level()
+
+
+class _QueueHandler(handlers.QueueHandler):
+    '''Queue handler leaving the output of the messages to the thread of the
+    listener.
+    '''
+    def prepare(self, record):
+        '''Prepare a record for the queue. The message, and any exception,
+        are formatted right away, since the build may change the arguments,
+        like meta data, while the record waits on the queue.
+
+        :param record: The log record.
+        :type record: LogRecord
+        :rtype: LogRecord
+        '''
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def init_queue_log():
+    '''Move the handlers to a thread of their own, reading the messages from
+    a queue.
+    '''
+    global queue_log, queue_listener
+    if queue_log is not None:
+        return
+    log_handlers = _get_handlers()
+    for handler in log_handlers:
+        logger.removeHandler(handler)
+    log_queue = queue.SimpleQueue()
+    queue_log = _QueueHandler(log_queue)
+    queue_listener = handlers.QueueListener(log_queue, *log_handlers,
+                                            respect_handler_level=True)
+    logger.addHandler(queue_log)
+    queue_listener.start()
+
+
+def init_worker_log():
+    '''Log directly from a forked worker process, which does not have the
+    thread of the queue.
+    '''
+    global queue_log, queue_listener
+    if queue_log is None:
+        return
+    logger.removeHandler(queue_log)
+    queue_log = None
+    queue_listener = None
+    for handler in _get_handlers():
+        logger.addHandler(handler)
 
 
 def close_log():
     '''Close all logs.'''
+    global queue_log, queue_listener
+    if queue_listener is not None:
+        # Handle what is left on the queue
+        queue_listener.stop()
+        logger.removeHandler(queue_log)
+        queue_log = None
+        queue_listener = None
     console_log.close()
-    file_log.close()
+    if file_log is not None:
+        file_log.close()
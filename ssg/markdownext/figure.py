@@ -38,7 +38,7 @@ class FigureExtension(Extension):
 class FigurePattern(LinkPattern):
     '''Figure extension for Markdown.'''
     def handleMatch(self, m):
-        logger.debug('Found figure: ' + m.group(2))
+        logger.debug('Found figure: %s', m.group(2))
         # Create a div for the whole thing.
         # TODO: Make classes configurable
         div = etree.Element('div',
@@ -28,9 +28,58 @@ Meta data extensions extract meta data from the name of the file, the content
 of the file, or some other useful data. Meta data extensions all inherit
 *MetaParserBase*.
 """
+import re
+
+
 # List of active meta data parsers.
 META_PARSERS = list()
 
+# Regular expressions of the Markdown meta data extension.
+META_RE = re.compile(r'^[ ]{0,3}(?P<key>[A-Za-z0-9_-]+):\s*(?P<value>.*)')
+META_MORE_RE = re.compile(r'^[ ]{4,}(?P<value>.*)')
+BEGIN_RE = re.compile(r'^-{3}(\s.*)?')
+END_RE = re.compile(r'^(-{3}|\.{3})(\s.*)?')
+
+
+def read_header(filename):
+    """Read the meta data header of a Markdown file, without reading the
+    rest of the file.
+
+    The header is parsed the same way as the Markdown meta data extension
+    does it, and the result is the same as the *Meta* attribute of the
+    Markdown processor after conversion.
+
+    :param filename: The full path of the Markdown file.
+    :type filename: string
+    :return: Meta data keys, and a list of lines for each.
+    :rtype: dict
+    """
+    meta = dict()
+    key = None
+    with open(filename, encoding='utf-8') as markdown_file:
+        for n_line, line in enumerate(markdown_file):
+            line = line.rstrip('\n').expandtabs(4)
+            # Skip a YAML style start of the header
+            if n_line == 0 and BEGIN_RE.match(line):
+                continue
+            # Blank line or end of YAML style header ends the header
+            if line.strip() == '' or END_RE.match(line):
+                break
+            match = META_RE.match(line)
+            if match:
+                key = match.group('key').lower().strip()
+                value = match.group('value').strip()
+                meta.setdefault(key, list()).append(value)
+            else:
+                match = META_MORE_RE.match(line)
+                if match and key:
+                    # Add another line to existing key
+                    meta[key].append(match.group('value').strip())
+                else:
+                    # No more meta data
+                    break
+    return meta
+
 
 def ishidden(metadata):
     """Check if content has 'status:' 'hidden.
@@ -53,6 +102,22 @@ class MetaParserBase(object):
         """Constructor"""
         pass
 
+    def prepare(self, filenames):
+        """
+        Prepare for parsing the content files of a build. Called once, before
+        any files are parsed, with all the content files. Parsers can use it
+        to compute data shared between files.
+
+        Worker processes are started after this is called, and are handed a
+        copy of the parsers, with what has been prepared. Where worker
+        processes cannot be forked, the parsers are pickled, so what is
+        prepared must be picklable.
+
+        :param filenames: Full paths of all content files.
+        :type filenames: list
+        """
+        pass
+
     def parse(self, path):
         """
         Parse something and return the metadata in a dictionary.
@@ -2,17 +2,28 @@
 from ssg.log import logger
 from ssg.metadata import META_PARSERS
 from ssg.settings import SETTINGS
+from ssg import plugins
+from ssg import profiler
 
-# Import extensions
-import ssg.metaext.categorymetaparser
+
+def parsers_prepare(filenames):
+    '''Prepare all active parsers for parsing some files.'''
+    plugins.load('metaparsers', SETTINGS['METAPARSERS'], META_PARSERS)
+    logger.debug("Preparing meta data parsers.")
+    for parser in META_PARSERS:
+        if parser.__class__.__name__ in SETTINGS['METAPARSERS']:
+            with profiler.span(parser.__class__.__name__, 'metaparser'):
+                parser.prepare(filenames)
 
 
 def parsers_run(filename):
     '''Run all active parsers.'''
+    plugins.load('metaparsers', SETTINGS['METAPARSERS'], META_PARSERS)
     logger.debug("Running meta data parsers.")
     metadata = dict()
     # Run through extra meta data parsers.
     for parser in META_PARSERS:
         if parser.__class__.__name__ in SETTINGS['METAPARSERS']:
-            metadata.update(parser.parse(filename))
+            with profiler.span(parser.__class__.__name__, 'metaparser'):
+                metadata.update(parser.parse(filename))
     return(metadata)
@@ -12,6 +12,11 @@ handles the last directory differently, according to these rules:
 - If there is only one content file, the directory name is interpreted as the
   title of the content and is discarded.
 
+Content files in sub directories are counted as well. The number of content
+files in each directory is found once per build, when the parser is
+prepared. Files in directories it does not know are counted by listing the
+directory.
+
 Reserved meta data keywords
 ---------------------------
 
@@ -22,6 +27,7 @@ category
 :author: oblivion
 """
 import os
+from fnmatch import fnmatch
 from ssg.log import logger
 from ssg.settings import SETTINGS
 from ssg import metadata
@@ -34,6 +40,45 @@ class CategoryMetaParser(metadata.MetaParserBase):
     def __init__(self):
         """Constructor."""
         metadata.MetaParserBase.__init__(self)
+        # Number of content files in each directory and below
+        self.counts = dict()
+
+    def prepare(self, filenames):
+        """
+        Count the content files in each directory, including the files in
+        sub directories.
+
+        :param filenames: Full paths of all content files.
+        :type filenames: list
+        """
+        logger.debug("Counting content files.")
+        content_path = os.path.join(SETTINGS['ROOTDIR'],
+                                    SETTINGS['CONTENTDIR'])
+        counts = dict()
+        for filename in filenames:
+            if not fnmatch(filename, '*.md'):
+                continue
+            # Count the file in its directory, and all those above it
+            path = os.path.dirname(filename)
+            while True:
+                counts[path] = counts.get(path, 0) + 1
+                if path == content_path or len(path) <= len(content_path):
+                    break
+                path = os.path.dirname(path)
+        self.counts = counts
+
+    def _count_files(self, content_dir):
+        """
+        Get the number of content files in a directory, and below.
+
+        :param content_dir: The directory.
+        :type content_dir: string
+        :returns: Number of files.
+        """
+        if content_dir in self.counts:
+            return self.counts[content_dir]
+        logger.debug("Listing unknown directory: %s", content_dir)
+        return len(get_files(content_dir, '*.md'))
 
     def parse(self, path):
         """
@@ -46,8 +91,8 @@ class CategoryMetaParser(metadata.MetaParserBase):
         logger.debug("Parsing category.")
         # Get content directory
         content_dir, _ = os.path.split(path)
-        # Get content in directory
-        content_files = get_files(content_dir, '*.md')
+        # Get number of content files in directory
+        n_files = self._count_files(content_dir)
         # Get content path
         content_path = os.path.join(SETTINGS['ROOTDIR'],
                                     SETTINGS['CONTENTDIR'])
@@ -58,9 +103,9 @@ class CategoryMetaParser(metadata.MetaParserBase):
         # Create category for each sub directory
         category = relpath.split('/')
 
-        if len(content_files) > 1:
+        if n_files > 1:
             # Multiply content files, treat last directory as a category
-            logger.debug("Category: " + str(category))
+            logger.debug("Category: %s", category)
             # Create dictionary for the meta data
             result = dict()
             # Set category to 'None' if no sub directory
@@ -72,7 +117,7 @@ class CategoryMetaParser(metadata.MetaParserBase):
         else:
             # Single content file, treat last directory as a title
             del category[-1]
-            logger.debug("Category: " + str(category))
+            logger.debug("Category: %s", category)
             # Create dictionary for the meta data
             result = dict()
             # Set category to 'None' if no sub directory
@@ -0,0 +1,250 @@
+'''
+Report of the cost of each page.
+
+When the report is enabled, with ``ssg --page-report pages.csv``, the time it
+takes to convert the Markdown of each page, to run the content filters on it,
+and to render its template, are recorded along with the template used, and
+the size of the output. With ``--trace-memory``, the peak of the memory
+allocated while doing so is recorded too, using :mod:`tracemalloc`.
+
+The pages are saved to a CSV file, and the slowest and largest pages are
+logged. Pages recorded in worker processes are handed back to the main
+process with the results of the jobs.
+
+When streaming, the render time includes writing the page.
+'''
+import csv
+import os
+import time
+from ssg.log import logger
+
+
+_ENABLED = False
+'''True if the report is enabled.'''
+
+_TRACE_MEMORY = False
+'''True if the memory allocated for each page is traced.'''
+
+_PID = None
+'''Process id of the main process.'''
+
+_PAGES = dict()
+'''Records of the pages, by output file.'''
+
+COLUMNS = ('dst_file', 'src_file', 'template', 'convert_ms', 'filter_ms',
+           'render_ms', 'total_ms', 'size', 'peak_bytes', 'cached')
+'''Columns of the CSV file.'''
+
+
+class _Measure(object):
+    '''
+    Measure the time, and the peak of allocated memory, of one step of a
+    page.
+    '''
+    __slots__ = ('page', 'key', 'start', 'baseline')
+
+    def __init__(self, page, key):
+        '''
+        Constructor.
+
+        :param page: The record of the page.
+        :type page: dict
+        :param key: Column the time is added to.
+        :type key: string
+        '''
+        self.page = page
+        self.key = key
+        self.start = 0
+        self.baseline = 0
+
+    def __enter__(self):
+        if _TRACE_MEMORY:
+            import tracemalloc
+            self.baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter_ns() - self.start) / 1000000
+        self.page[self.key] = self.page.get(self.key, 0) + elapsed
+        if _TRACE_MEMORY:
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1] - self.baseline
+            self.page['peak_bytes'] = max(self.page.get('peak_bytes', 0),
+                                          peak)
+        return False
+
+
+class _NoMeasure(object):
+    '''
+    A measure doing nothing, used when the report is disabled.
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_MEASURE = _NoMeasure()
+
+
+def enable(trace_memory=False):
+    '''Enable the report.
+
+    :param trace_memory: Trace the peak of the memory allocated for each
+                         page, which slows down the build.
+    :type trace_memory: bool
+    '''
+    global _ENABLED, _TRACE_MEMORY, _PID
+    _ENABLED = True
+    _TRACE_MEMORY = trace_memory
+    _PID = os.getpid()
+    if trace_memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def is_enabled():
+    '''Check if the report is enabled.
+
+    :rtype: bool
+    '''
+    return _ENABLED
+
+
+def _get_page(content):
+    '''Get the record of the page of some content.
+
+    :param content: The content.
+    :type content: dict
+    :rtype: dict
+    '''
+    metadata = content['metadata']
+    return _PAGES.setdefault(metadata['dst_file'],
+                             {'dst_file': metadata['dst_file'],
+                              'src_file': metadata['src_file']})
+
+
+def measure(content, key):
+    '''Measure a step of the page of some content, using a ``with``
+    statement.
+
+    :param content: The content.
+    :type content: dict
+    :param key: The step, *convert_ms*, *filter_ms*, or *render_ms*.
+    :type key: string
+    '''
+    if not _ENABLED:
+        return _NO_MEASURE
+    return _Measure(_get_page(content), key)
+
+
+def record(content, **values):
+    '''Record values for the page of some content, like the template, or
+    the size.
+
+    :param content: The content.
+    :type content: dict
+    '''
+    if _ENABLED:
+        _get_page(content).update(values)
+
+
+def init_worker():
+    '''Forget the pages a worker process inherited from the main process.'''
+    _PAGES.clear()
+
+
+def take_worker_pages():
+    '''Take the pages recorded by a worker process, to hand them to the main
+    process.
+
+    :return: The pages, or None in the main process, or when the report is
+             disabled.
+    :rtype: list
+    '''
+    if not _ENABLED or os.getpid() == _PID:
+        return None
+    pages = list(_PAGES.values())
+    _PAGES.clear()
+    return pages
+
+
+def add_pages(pages):
+    '''Add pages recorded by a worker process.
+
+    :param pages: The records of the pages.
+    :type pages: list
+    '''
+    for page in pages:
+        known = _PAGES.setdefault(page['dst_file'], dict())
+        for key, value in page.items():
+            if key.endswith('_ms'):
+                value += known.get(key, 0)
+            elif key == 'peak_bytes':
+                value = max(value, known.get(key, 0))
+            known[key] = value
+
+
+def _get_rows():
+    '''Get the records of the pages, slowest first.
+
+    :rtype: list
+    '''
+    rows = list()
+    for page in _PAGES.values():
+        row = dict((column, page.get(column, '')) for column in COLUMNS)
+        row['total_ms'] = sum(page.get(key, 0) for key in
+                              ('convert_ms', 'filter_ms', 'render_ms'))
+        rows.append(row)
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def log_summary(rows, top=10):
+    '''Log the slowest and the largest pages.
+
+    :param rows: The records of the pages, slowest first.
+    :type rows: list
+    :param top: Number of pages logged in each list.
+    :type top: int
+    '''
+    logger.info('Slowest pages:')
+    logger.info('%10s %10s %10s %10s  %s', 'Total ms', 'Convert ms',
+                'Filter ms', 'Render ms', 'Page')
+    for row in rows[:top]:
+        logger.info('%10.2f %10.2f %10.2f %10.2f  %s', row['total_ms'],
+                    row['convert_ms'] or 0, row['filter_ms'] or 0,
+                    row['render_ms'] or 0, row['src_file'] or row['dst_file'])
+    logger.info('Largest pages:')
+    logger.info('%10s %10s  %s', 'Size', 'Peak bytes', 'Page')
+    for row in sorted(rows, key=lambda row: row['size'] or 0,
+                      reverse=True)[:top]:
+        logger.info('%10s %10s  %s', row['size'], row['peak_bytes'],
+                    row['src_file'] or row['dst_file'])
+
+
+def save(filename, top=10):
+    '''Save the records of all pages to a CSV file, slowest first, and log
+    the slowest and largest pages.
+
+    :param filename: Name of the CSV file.
+    :type filename: string
+    :param top: Number of pages logged in each list.
+    :type top: int
+    '''
+    rows = _get_rows()
+    with open(filename, 'w', newline='') as report_file:
+        report = csv.DictWriter(report_file, COLUMNS)
+        report.writeheader()
+        for row in rows:
+            report.writerow(dict(
+                (key, round(value, 3) if isinstance(value, float) else value)
+                for key, value in row.items()))
+    logger.info('Saved %s pages to: %s', len(rows), filename)
+    log_summary(rows, top)
@@ -0,0 +1,85 @@
+'''
+Loading of the extensions: generators, content filters, and meta data parsers.
+
+Extensions are only imported when they are enabled in the *GENERATORS*,
+*CONTENTFILTERS*, or *METAPARSERS* setting. Importing the module of an
+extension registers it, by adding an instance to the list of its kind.
+
+The extensions of ssg are listed in :data:`BUILTIN`. Other packages can add
+extensions with an entry point in the ``ssg.generators``,
+``ssg.contentfilters``, or ``ssg.metaparsers`` group, named like the class of
+the extension. The entry point refers to either the module registering the
+extension, or the class, which is then instantiated and registered.
+'''
+import importlib
+from ssg.log import logger
+
+
+BUILTIN = {
+    'generators': {
+        'BlogIndexGenerator': 'ssg.generators.blogindex',
+        'CategoryIndexGenerator': 'ssg.generators.categoryindex',
+        'TagCloudGenerator': 'ssg.generators.tagcloud'
+    },
+    'contentfilters': {
+        'LocalURL': 'ssg.contentfilters.localurl'
+    },
+    'metaparsers': {
+        'CategoryMetaParser': 'ssg.metaext.categorymetaparser'
+    }
+}
+'''Modules of the extensions of ssg, by kind and class name.'''
+
+
+_ENTRY_POINTS = dict()
+'''Entry points of the installed extensions, by kind.'''
+
+_LOADED = set()
+'''Kind and name of the extensions loaded, or found unknown.'''
+
+
+def _get_entry_points(kind):
+    '''Get the entry points of the installed extensions of a kind.
+
+    :param kind: The kind of extension.
+    :type kind: string
+    :return: Entry points by name.
+    :rtype: dict
+    '''
+    if kind not in _ENTRY_POINTS:
+        from importlib.metadata import entry_points
+        _ENTRY_POINTS[kind] = dict(
+            (entry_point.name, entry_point)
+            for entry_point in entry_points(group='ssg.' + kind))
+    return _ENTRY_POINTS[kind]
+
+
+def load(kind, names, registry):
+    '''Load the enabled extensions of a kind, that are not loaded already.
+
+    :param kind: The kind of extension, *generators*, *contentfilters*, or
+                 *metaparsers*.
+    :type kind: string
+    :param names: Class names of the enabled extensions.
+    :type names: list
+    :param registry: The instances of the loaded extensions of the kind.
+    :type registry: list
+    '''
+    for name in names:
+        if (kind, name) in _LOADED:
+            continue
+        _LOADED.add((kind, name))
+        if any(plugin.__class__.__name__ == name for plugin in registry):
+            # Registered some other way
+            continue
+        if name in BUILTIN[kind]:
+            logger.debug('Loading %s from %s.', name, BUILTIN[kind][name])
+            importlib.import_module(BUILTIN[kind][name])
+        elif name in _get_entry_points(kind):
+            entry_point = _get_entry_points(kind)[name]
+            logger.debug('Loading %s from %s.', name, entry_point.value)
+            plugin = entry_point.load()
+            if isinstance(plugin, type):
+                registry.append(plugin())
+        else:
+            logger.warning('Unknown extension in %s: %s', kind.upper(), name)
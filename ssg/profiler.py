@@ -0,0 +1,172 @@
+'''
+Profiling of builds.
+
+When profiling is enabled, with ``ssg --profile out.json``, the stages of the
+build, the extensions, and the jobs run for each file, are timed as spans.
+The spans are saved in the Chrome trace event format, which can be viewed in
+Perfetto, or ``chrome://tracing``, and summed up in a table in the log.
+
+Spans timed in worker processes are handed back to the main process with the
+results of the jobs.
+
+When profiling is disabled, :func:`span` returns a span that does nothing,
+so that timing costs next to nothing.
+'''
+import json
+import os
+import threading
+import time
+from ssg.log import logger
+
+
+_ENABLED = False
+'''True if profiling is enabled.'''
+
+_PID = None
+'''Process id of the main process.'''
+
+_EVENTS = list()
+'''Trace events of the spans timed by this process.'''
+
+
+class _Span(object):
+    '''
+    A span, recording a trace event when it ends.
+    '''
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        '''
+        Constructor.
+
+        :param name: Name of the span.
+        :type name: string
+        :param category: Category of the span.
+        :type category: string
+        :param args: Extra values shown with the span, or None.
+        :type args: dict
+        '''
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        event = {'name': self.name, 'cat': self.category, 'ph': 'X',
+                 'ts': self.start / 1000, 'dur': (end - self.start) / 1000,
+                 'pid': os.getpid(), 'tid': threading.get_native_id()}
+        if self.args is not None:
+            event['args'] = self.args
+        _EVENTS.append(event)
+        return False
+
+
+class _NoSpan(object):
+    '''
+    A span doing nothing, used when profiling is disabled.
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def enable():
+    '''Enable profiling.'''
+    global _ENABLED, _PID
+    _ENABLED = True
+    _PID = os.getpid()
+
+
+def is_enabled():
+    '''Check if profiling is enabled.
+
+    :rtype: bool
+    '''
+    return _ENABLED
+
+
+def span(name, category='stage', args=None):
+    '''Time a span, using a ``with`` statement.
+
+    :param name: Name of the span.
+    :type name: string
+    :param category: Category of the span, like *stage*, or *generator*.
+    :type category: string
+    :param args: Extra values shown with the span.
+    :type args: dict
+    '''
+    if not _ENABLED:
+        return _NO_SPAN
+    return _Span(name, category, args)
+
+
+def init_worker():
+    '''Forget the events a worker process inherited from the main process.'''
+    del _EVENTS[:]
+
+
+def take_worker_events():
+    '''Take the events recorded by a worker process, to hand them to the main
+    process.
+
+    :return: The events, or None in the main process, or when profiling is
+             disabled.
+    :rtype: list
+    '''
+    if not _ENABLED or os.getpid() == _PID:
+        return None
+    events = list(_EVENTS)
+    del _EVENTS[:]
+    return events
+
+
+def add_events(events):
+    '''Add events recorded by a worker process.
+
+    :param events: The events.
+    :type events: list
+    '''
+    _EVENTS.extend(events)
+
+
+def log_summary():
+    '''Log the total time of the spans, by category and name, largest
+    first.
+    '''
+    totals = dict()
+    for event in _EVENTS:
+        key = (event['cat'], event['name'])
+        count, total, longest = totals.get(key, (0, 0, 0))
+        totals[key] = (count + 1, total + event['dur'],
+                       max(longest, event['dur']))
+    logger.info('%-14s %-32s %8s %12s %12s', 'Category', 'Name', 'Count',
+                'Total ms', 'Max ms')
+    for (category, name), (count, total, longest) in sorted(
+            totals.items(), key=lambda item: item[1][1], reverse=True):
+        logger.info('%-14s %-32s %8d %12.2f %12.2f', category, name[:32],
+                    count, total / 1000, longest / 1000)
+
+
+def save(filename):
+    '''Save the spans as Chrome trace events, and log a summary.
+
+    :param filename: Name of the trace file.
+    :type filename: string
+    '''
+    with open(filename, 'w') as trace_file:
+        json.dump({'traceEvents': _EVENTS, 'displayTimeUnit': 'ms'},
+                  trace_file)
+    logger.info('Saved %s spans to: %s', len(_EVENTS), filename)
+    log_summary()
@@ -0,0 +1,228 @@
+'''
+Publishing the output as releases.
+
+If the *PUBLISHDIR* setting is set, each build is published as a release,
+once it has been written. A release is a copy of the output directory in
+*RELEASEDIR*, made of hard links, so it takes no time, and no space, for
+files that are already in other releases. *PUBLISHDIR* is a symbolic link to
+the current release, and is switched to the new release in one atomic rename.
+A web server serving *PUBLISHDIR* never sees a half written site, and a build
+that fails leaves the current release alone.
+
+The writer never writes into an existing output file, it replaces it, so the
+files of a release are never changed by later builds. When *ASSETCOPY* is
+``'hardlink'``, output files may be hard links to the content files, which
+can be edited in place. These files are copied into the release, instead of
+linked.
+
+The newest *RELEASES* releases are kept, and :func:`rollback` switches back to
+the release before the current one.
+'''
+from datetime import datetime
+import os
+import shutil
+from ssg.log import logger
+from ssg.settings import SETTINGS
+from ssg.tools import die, get_snapshot
+
+
+def _get_publish_path():
+    '''Get the path of the symbolic link to the current release.
+
+    :rtype: string
+    '''
+    return os.path.join(SETTINGS['ROOTDIR'], SETTINGS['PUBLISHDIR'])
+
+
+def _get_release_path():
+    '''Get the path of the directory with the releases.
+
+    :rtype: string
+    '''
+    return os.path.join(SETTINGS['ROOTDIR'], SETTINGS['RELEASEDIR'])
+
+
+def _get_source_inodes():
+    '''Get the inodes of the content files, when *ASSETCOPY* is
+    ``'hardlink'``, and files in the output may be hard links to them.
+
+    :return: Device, and inode, of each content file, or an empty set if the
+             output has no hard links to them.
+    :rtype: set
+    '''
+    if SETTINGS['ASSETCOPY'] != 'hardlink':
+        return set()
+    sources = get_snapshot(os.path.join(SETTINGS['ROOTDIR'],
+                                        SETTINGS['CONTENTDIR']))
+    inodes = set()
+    for filename in sources.files:
+        stat = sources.stat(filename)
+        inodes.add((stat.st_dev, stat.st_ino))
+    return inodes
+
+
+def _link_tree(src, dst, sources, current=None):
+    '''Copy a directory, and all directories below it, as hard links. Files
+    that can not be linked are copied.
+
+    Files that are hard links to content files are copied, so that editing
+    the content does not change the release. The copy in the current release
+    is linked instead, if the file has not changed since.
+
+    :param src: The directory.
+    :type src: string
+    :param dst: The copy.
+    :type dst: string
+    :param sources: Device, and inode, of each content file.
+    :type sources: set
+    :param current: The directory in the current release, if any.
+    :type current: string
+    :return: Number of files.
+    :rtype: int
+    '''
+    os.mkdir(dst)
+    files = 0
+    for entry in os.scandir(src):
+        filename = os.path.join(dst, entry.name)
+        current_filename = None
+        if current is not None:
+            current_filename = os.path.join(current, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            files += _link_tree(entry.path, filename, sources,
+                                current_filename)
+            continue
+        files += 1
+        link_src = entry.path
+        if len(sources) > 0 and not entry.is_symlink():
+            stat = entry.stat()
+            if (stat.st_dev, stat.st_ino) in sources:
+                link_src = _get_released_copy(stat, current_filename,
+                                              sources)
+                if link_src is None:
+                    shutil.copy2(entry.path, filename)
+                    continue
+        try:
+            os.link(link_src, filename, follow_symlinks=False)
+        except OSError:
+            shutil.copy2(link_src, filename, follow_symlinks=False)
+    return files
+
+
+def _get_released_copy(stat, filename, sources):
+    '''Get the copy of a file in the current release, if it is unchanged.
+
+    :param stat: Stat result of the file in the output.
+    :type stat: os.stat_result
+    :param filename: The file in the current release, if any.
+    :type filename: string
+    :param sources: Device, and inode, of each content file.
+    :type sources: set
+    :return: The copy, or None if it is missing, or changed.
+    :rtype: string
+    '''
+    if filename is None:
+        return None
+    try:
+        released = os.stat(filename, follow_symlinks=False)
+    except OSError:
+        return None
+    if ((released.st_dev, released.st_ino) in sources or
+            released.st_size != stat.st_size or
+            released.st_mtime_ns != stat.st_mtime_ns):
+        return None
+    return filename
+
+
+def get_releases():
+    '''Get the names of the releases, oldest first.
+
+    :rtype: list
+    '''
+    release_path = _get_release_path()
+    if not os.path.isdir(release_path):
+        return list()
+    return sorted(entry.name for entry in os.scandir(release_path)
+                  if entry.is_dir() and not entry.name.startswith('.'))
+
+
+def get_current_release():
+    '''Get the name of the current release.
+
+    :return: The name, or None if nothing has been published.
+    :rtype: string
+    '''
+    publish_path = _get_publish_path()
+    if not os.path.islink(publish_path):
+        return None
+    return os.path.basename(os.readlink(publish_path))
+
+
+def _switch(name):
+    '''Make a release the current one, atomically.
+
+    :param name: Name of the release.
+    :type name: string
+    '''
+    publish_path = _get_publish_path()
+    if os.path.lexists(publish_path) and not os.path.islink(publish_path):
+        logger.error('Can not publish, "%s" is not a symbolic link.',
+                     publish_path)
+        die()
+    target = os.path.relpath(os.path.join(_get_release_path(), name),
+                             os.path.dirname(publish_path))
+    tmp_path = publish_path + '.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    os.symlink(target, tmp_path)
+    os.replace(tmp_path, publish_path)
+    logger.info('Published release: %s', name)
+
+
+def _prune():
+    '''Delete the oldest releases, keeping *RELEASES* releases, and the
+    current one.
+    '''
+    current = get_current_release()
+    releases = get_releases()
+    for name in releases[:max(len(releases) - SETTINGS['RELEASES'], 0)]:
+        if name == current:
+            continue
+        logger.info('Deleting release: %s', name)
+        shutil.rmtree(os.path.join(_get_release_path(), name))
+
+
+def publish(output_path):
+    '''Publish the output as a new release.
+
+    :param output_path: Path to the output.
+    :type output_path: string
+    '''
+    release_path = _get_release_path()
+    os.makedirs(release_path, exist_ok=True)
+    # Delete releases left half staged by a failed build
+    for entry in os.scandir(release_path):
+        if entry.name.startswith('.') and entry.is_dir():
+            shutil.rmtree(entry.path)
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    # Stage the release under a hidden name, so a failed copy is not listed
+    staging_path = os.path.join(release_path, '.' + name)
+    current = get_current_release()
+    current_path = None
+    if current is not None:
+        current_path = os.path.join(release_path, current)
+    files = _link_tree(output_path, staging_path, _get_source_inodes(),
+                       current_path)
+    os.rename(staging_path, os.path.join(release_path, name))
+    logger.debug('Staged %s files in release: %s', files, name)
+    _switch(name)
+    _prune()
+
+
+def rollback():
+    '''Make the release before the current one the current release.'''
+    current = get_current_release()
+    releases = get_releases()
+    if current not in releases or releases.index(current) == 0:
+        logger.error('No release to roll back to.')
+        die()
+    _switch(releases[releases.index(current) - 1])
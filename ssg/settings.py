@@ -42,6 +42,91 @@ GENERATORS
 
 CONTENTFILTERS
     List of enabled content filters. Default *empty*.
+
+JOBS
+    Number of worker processes used to convert, and render the content.
+    Default *1*.
+
+IOJOBS
+    Number of threads used to write, copy, and delete output files. More
+    threads help on slow, or network, storage. Default *4*.
+
+CACHE
+    Keep converted Markdown, and compiled templates, in a cache, to skip
+    converting unchanged content, and compiling unchanged templates. Default
+    *True*.
+
+CACHEDIR
+    Sub directory of ROOTDIR where cached data is kept. Default *.ssg-cache*.
+
+CACHESIZE
+    Maximum size in bytes of the cache of converted Markdown. Default
+    *268435456* (256 MiB).
+
+STREAM
+    Write each page while it is rendered, and free its HTML afterwards, to
+    keep memory use down on large sites. Default *False*.
+
+BUILDSTATE
+    Record the state of each build, and use it to only process what has
+    changed at the next build. Default *True*.
+
+STATEFILE
+    Name of the build state database in ROOTDIR. Default *.ssg-state.db*.
+
+CHANGEDETECTION
+    How changed files are detected, when using the build state. *mtime*
+    compares size, modification time, and inode. *hash* also compares a hash
+    of the contents, when these change, so touched but unchanged files are
+    skipped. Default *mtime*.
+
+MANIFEST
+    Name of the file in ROOTDIR, listing the files written by the last build,
+    when *BUILDSTATE* is False. The build state records them otherwise.
+    Default *.ssg-manifest*.
+
+ASSETCOPY
+    How files that are not content are copied to the output. *copy* copies the
+    files. *hardlink* links them, so they must not be edited in the output.
+    *reflink* clones them, on file systems like Btrfs, and XFS.
+    *copy_file_range* copies them in the kernel. Modes that are not supported
+    fall back to *copy*. When *PUBLISHDIR* is set, files linked by *hardlink*
+    are copied into the releases, so that editing content in place does not
+    change a published release. Default *copy*.
+
+PUBLISHDIR
+    Name of a symbolic link in ROOTDIR, to the current release of the site.
+    If set, each build is published as a new release, which replaces the
+    current one atomically. Default *empty*, which does not publish.
+
+RELEASEDIR
+    Sub directory of ROOTDIR where the releases are kept. Default
+    *.releases*.
+
+RELEASES
+    Number of releases to keep, for rolling back. Default *3*.
+
+LOGFILE
+    Name of the log file, in the current directory. The log of the previous
+    run is kept as a backup. An empty name turns the file log off. Default
+    *ssg.log*.
+
+LOGLEVEL
+    Lowest level of the messages logged to the file, like *INFO*, or
+    *WARNING*. Default *DEBUG*.
+
+LOGQUEUE
+    Write the logs from a thread of their own, so that logging does not
+    wait for the console, or the disk. Default *False*.
+
+REPORTPAGES
+    Number of the slowest, and the largest pages, logged by the page report
+    of ``ssg --page-report``. Default *10*.
+
+IGNORE
+    List of glob patterns, like ``node_modules`` or ``*.swp``. Files and
+    directories with a matching name are ignored, everywhere. Hidden files are
+    always ignored. Default *empty*.
 '''
 from importlib.machinery import SourceFileLoader
 import os
@@ -60,7 +145,26 @@ DEFAULT_CONFIG = {
     'COPYSOURCES': True,
     'METAPARSERS': list(),
     'GENERATORS': list(),
-    'CONTENTFILTERS': list()
+    'CONTENTFILTERS': list(),
+    'JOBS': 1,
+    'IOJOBS': 4,
+    'CACHE': True,
+    'CACHEDIR': '.ssg-cache',
+    'CACHESIZE': 256 * 1024 * 1024,
+    'STREAM': False,
+    'BUILDSTATE': True,
+    'STATEFILE': '.ssg-state.db',
+    'CHANGEDETECTION': 'mtime',
+    'MANIFEST': '.ssg-manifest',
+    'ASSETCOPY': 'copy',
+    'PUBLISHDIR': '',
+    'RELEASEDIR': '.releases',
+    'RELEASES': 3,
+    'LOGFILE': 'ssg.log',
+    'LOGLEVEL': 'DEBUG',
+    'LOGQUEUE': False,
+    'REPORTPAGES': 10,
+    'IGNORE': list()
 }
 
 # Dictionary for all configuration values.
@@ -89,8 +193,8 @@ def init(root):
         logger.warning("No config.py found, using default values.")
     except SyntaxError as exception:
         logger.error('Syntax error in configuration file.')
-        logger.error(str(exception.lineno) + ':' + str(exception.offset) +
-                     ': ' + exception.text)
+        logger.error('%s:%s: %s', exception.lineno, exception.offset,
+                     exception.text)
         exit(1)
 
 
@@ -0,0 +1,147 @@
+'''
+The site index is built once per build, from the content read from files,
+before the generators run. It is available to the generators, and to the
+templates, as ``context.index``.
+
+The index is built in a single pass over the content, and holds:
+
+posts
+    The visible posts, sorted by date, newest first. A post is content using
+    the *post* template, that is not hidden.
+
+tags
+    The visible posts with each tag, in the same order. Tags are lower case.
+
+categories
+    The visible posts in each category, in the same order. Categories are
+    named by their path, like ``blog/python``.
+
+category_tree
+    The categories as a tree. Each node has the *name* and *path* of the
+    category, the *posts* directly in it, and its *children* by name.
+
+urls
+    All content by URL.
+'''
+from ssg.log import logger
+from ssg.metadata import ishidden
+
+
+def _new_category(name, path):
+    '''
+    Create a node of the category tree.
+
+    :param name: Name of the category.
+    :type name: string
+    :param path: Path of the category.
+    :type path: string
+    :rtype: dict
+    '''
+    return {'name': name, 'path': path, 'posts': list(), 'children': dict()}
+
+
+class SiteIndex(object):
+    '''
+    Index of the content of the site.
+    '''
+    def __init__(self, contents):
+        '''
+        Constructor, building the index.
+
+        :param contents: The content of the site.
+        :type contents: list
+        '''
+        self.posts = list()
+        '''Visible posts, newest first.'''
+        self.tags = dict()
+        '''Visible posts by tag.'''
+        self.categories = dict()
+        '''Visible posts by category path.'''
+        self.category_tree = _new_category('', '')
+        '''Root of the category tree.'''
+        self.urls = dict()
+        '''Content by URL.'''
+        self._post_tags = dict()
+        '''Tags of each visible post, by URL.'''
+        logger.debug('Building site index.')
+        for content in contents:
+            metadata = content['metadata']
+            if 'URL' in metadata:
+                self.urls[metadata['URL']] = content
+            if metadata['template'] != 'post':
+                continue
+            if ishidden(metadata):
+                logger.debug('Hiding: %s', metadata['title'])
+                continue
+            self.posts.append(content)
+        # Stable, so posts with the same date keep their order
+        self.posts.sort(key=lambda post: post['metadata']['date'],
+                        reverse=True)
+        for post in self.posts:
+            self._add_tags(post)
+            self._add_category(post)
+        logger.debug('Indexed %s posts, %s tags, and %s categories.',
+                     len(self.posts), len(self.tags),
+                     len(self.categories))
+
+    def _add_tags(self, post):
+        '''
+        Add a post to the tag index.
+
+        :param post: The post.
+        :type post: dict
+        '''
+        tags = list()
+        if 'tags' in post['metadata']:
+            for tag in post['metadata']['tags'].split(','):
+                tag = tag.strip().lower()
+                if tag in tags:
+                    continue
+                tags.append(tag)
+                self.tags.setdefault(tag, list()).append(post)
+        self._post_tags[post['metadata']['URL']] = tags
+
+    def _add_category(self, post):
+        '''
+        Add a post to the category index, and the category tree.
+
+        :param post: The post.
+        :type post: dict
+        '''
+        if 'category' not in post['metadata']:
+            return
+        category = post['metadata']['category']
+        path = '/'.join(category)
+        self.categories.setdefault(path, list()).append(post)
+        node = self.category_tree
+        for name in category:
+            if name not in node['children']:
+                node['children'][name] = _new_category(
+                    name, (node['path'] + '/' + name).lstrip('/'))
+            node = node['children'][name]
+        node['posts'].append(post)
+
+    def get_tags(self, content):
+        '''
+        Get the tags of some content.
+
+        :param content: The content.
+        :type content: dict
+        :return: The tags, or an empty list if the content is not a visible
+                 post.
+        :rtype: list
+        '''
+        return self._post_tags.get(content['metadata'].get('URL'), list())
+
+    def get_category(self, content):
+        '''
+        Get the category path of some content.
+
+        :param content: The content.
+        :type content: dict
+        :return: The path, or None if the content has no category.
+        :rtype: string
+        '''
+        if 'category' not in content['metadata']:
+            return None
+        return '/'.join(content['metadata']['category'])
@@ -0,0 +1,314 @@
+'''
+Handling of the Jinja2 templates.
+
+Templates are loaded from the *TEMPLATEDIR* directory of the site. A page
+depends on its own template, and every template pulled in by ``extends``,
+``include``, and ``import`` from there. These dependencies are used to only
+update the pages whose templates have actually changed.
+
+Compiling templates
+-------------------
+
+Unless the *CACHE* setting is False, Jinja2 keeps the bytecode of compiled
+templates in the *CACHEDIR* directory, and only compiles a template again
+when its source changes.
+
+The templates can also be compiled ahead of time to Python modules, by
+running ``ssg --compile-templates``. The modules are loaded instead of the
+templates, as long as no template has changed since they were compiled.
+'''
+import json
+import os
+import shutil
+import jinja2
+from jinja2 import Environment, FileSystemLoader, ModuleLoader
+from jinja2 import FileSystemBytecodeCache, TemplateNotFound, meta
+from ssg.log import logger
+from ssg.settings import SETTINGS
+
+
+STAMP_FILE = 'stamp.json'
+'''File in the compiled templates directory, recording the templates.'''
+
+_ENVIRONMENTS = dict()
+'''Jinja2 environments by template path.'''
+
+
+class CompiledLoader(ModuleLoader):
+    '''
+    Load templates compiled to Python modules, while still reading the
+    source of templates from the template directory.
+    '''
+    def __init__(self, compiled_path, path):
+        '''
+        Constructor.
+
+        :param compiled_path: Path to the compiled templates.
+        :type compiled_path: string
+        :param path: Path to templates
+        :type path: string
+        '''
+        ModuleLoader.__init__(self, compiled_path)
+        self.source_loader = FileSystemLoader(path)
+
+    def get_source(self, environment, template):
+        '''
+        Get the source of a template, from the template directory.
+        '''
+        return self.source_loader.get_source(environment, template)
+
+    def list_templates(self):
+        '''
+        List the templates in the template directory.
+        '''
+        return self.source_loader.list_templates()
+
+
+def _get_cache_path(name):
+    '''
+    Get a path in the cache directory of the site.
+
+    :param name: Name of the sub directory.
+    :type name: string
+    :rtype: string
+    '''
+    return os.path.join(SETTINGS['ROOTDIR'], SETTINGS['CACHEDIR'], name)
+
+
+def _get_stamp(path):
+    '''
+    Get the size and modification time of all templates, along with the
+    version of Jinja2.
+
+    :param path: Path to templates
+    :type path: string
+    :rtype: dict
+    '''
+    templates = dict()
+    for name in FileSystemLoader(path).list_templates():
+        stat = os.stat(os.path.join(path, name))
+        templates[name] = [stat.st_size, stat.st_mtime_ns]
+    return {'jinja2': jinja2.__version__, 'path': path,
+            'templates': templates}
+
+
+def _get_compiled_path(path):
+    '''
+    Get the path of compiled templates, if they are up to date.
+
+    :param path: Path to templates
+    :type path: string
+    :return: The path, or None if the templates are not compiled.
+    :rtype: string
+    '''
+    compiled_path = _get_cache_path('templates')
+    try:
+        with open(os.path.join(compiled_path, STAMP_FILE)) as stamp_file:
+            stamp = json.load(stamp_file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if stamp != _get_stamp(path):
+        logger.warning('Templates changed since they were compiled, not '
+                       'using the compiled templates.')
+        return None
+    return compiled_path
+
+
+def get_environment(path):
+    '''
+    Get the Jinja2 environment used for the site, creating it the first time.
+
+    The environment is kept, along with the templates it has compiled. Jinja2
+    checks if a template has changed, each time it is loaded, except for
+    templates compiled by :func:`compile_templates`. Use
+    :func:`forget_environments` when these may have changed.
+
+    :param path: Path to templates
+    :type path: string
+    :return: The environment.
+    :rtype: jinja2.Environment
+    '''
+    if path in _ENVIRONMENTS:
+        return _ENVIRONMENTS[path]
+    if not SETTINGS['CACHE']:
+        env = Environment(loader=FileSystemLoader(path))
+    else:
+        compiled_path = _get_compiled_path(path)
+        if compiled_path is not None:
+            logger.debug('Using compiled templates in: %s', compiled_path)
+            env = Environment(loader=CompiledLoader(compiled_path, path))
+        else:
+            cache_path = _get_cache_path('jinja')
+            os.makedirs(cache_path, mode=0o755, exist_ok=True)
+            env = Environment(loader=FileSystemLoader(path),
+                              bytecode_cache=FileSystemBytecodeCache(
+                                  cache_path))
+    _ENVIRONMENTS[path] = env
+    return env
+
+
+def forget_environments():
+    '''
+    Forget all environments, and the templates they have compiled.
+    '''
+    _ENVIRONMENTS.clear()
+
+
+def compile_templates(path):
+    '''
+    Compile all templates to Python modules, in the *CACHEDIR* directory.
+
+    :param path: Path to templates
+    :type path: string
+    '''
+    logger.info('Compiling templates.')
+    compiled_path = _get_cache_path('templates')
+    # Start over, to not leave templates that have been deleted
+    if os.path.isdir(compiled_path):
+        shutil.rmtree(compiled_path)
+    # Record the templates first, a template changed while compiling is
+    # then found out of date
+    stamp = _get_stamp(path)
+    env = Environment(loader=FileSystemLoader(path))
+    env.compile_templates(compiled_path, zip=None, ignore_errors=False,
+                          log_function=logger.debug)
+    with open(os.path.join(compiled_path, STAMP_FILE), 'w') as stamp_file:
+        json.dump(stamp, stamp_file)
+    forget_environments()
+    logger.info('Compiled %s templates.', len(stamp['templates']))
+
+
+def get_template_name(content):
+    '''
+    Get the name of the template used to render some content.
+
+    :param content: The content.
+    :type content: dict
+    :return: The template name.
+    :rtype: string
+    '''
+    # Use specified template or page.html
+    if 'template' in content['metadata'].keys():
+        return content['metadata']['template'] + '.html'
+    return 'page.html'
+
+
+class TemplateDependencies(object):
+    '''
+    Find the templates that a template depends on.
+    '''
+    def __init__(self, env):
+        '''
+        Constructor.
+
+        :param env: The environment to load templates from.
+        :type env: jinja2.Environment
+        '''
+        self.env = env
+        self._references = dict()
+        '''Templates referenced directly by each template.'''
+        self._filenames = dict()
+        '''File name of each template.'''
+        self._mtimes = dict()
+        '''Modification time of each template.'''
+
+    def _get_references(self, name):
+        '''
+        Get the templates referenced directly by a template.
+
+        :param name: Name of the template.
+        :type name: string
+        :return: Set of names, or None if a name is only known when rendering.
+        :rtype: set
+        '''
+        if name not in self._references:
+            source, filename, _ = self.env.loader.get_source(self.env, name)
+            self._filenames[name] = filename
+            references = set()
+            for reference in meta.find_referenced_templates(
+                    self.env.parse(source)):
+                if reference is None:
+                    logger.debug('Dynamic template reference in: %s', name)
+                    references = None
+                    break
+                references.add(reference)
+            self._references[name] = references
+        return self._references[name]
+
+    def get(self, name):
+        '''
+        Get all templates a template depends on, including itself.
+
+        Missing templates referenced by the template, like those included
+        with ``ignore missing``, are part of the dependencies, so that
+        adding, or deleting, them updates the pages using them.
+
+        :param name: Name of the template.
+        :type name: string
+        :return: Set of names, or None if the dependencies cannot be found
+                 without rendering. An empty set if the template itself is
+                 missing.
+        :rtype: set
+        '''
+        dependencies = set()
+        pending = [name]
+        while len(pending) > 0:
+            current = pending.pop()
+            if current in dependencies:
+                continue
+            try:
+                references = self._get_references(current)
+            except TemplateNotFound:
+                # Rendering will report it, if it is not optional
+                logger.debug('Template not found: %s', current)
+                if current == name:
+                    return set()
+                dependencies.add(current)
+                continue
+            if references is None:
+                return None
+            dependencies.add(current)
+            pending.extend(references)
+        return dependencies
+
+    def get_mtime(self, name):
+        '''
+        Get the modification time of a template.
+
+        A missing template has the modification time of the directory it
+        would be in, which changes when the template is deleted.
+
+        :param name: Name of the template.
+        :type name: string
+        :return: Modification time, or 0 if neither the template, nor its
+                 directory, exist.
+        :rtype: float
+        '''
+        if name not in self._mtimes:
+            try:
+                self._get_references(name)
+                self._mtimes[name] = os.stat(self._filenames[name]).st_mtime
+            except TemplateNotFound:
+                self._mtimes[name] = self._get_missing_mtime(name)
+        return self._mtimes[name]
+
+    def _get_missing_mtime(self, name):
+        '''
+        Get the modification time of the directory a missing template would
+        be in, or of the closest directory above it that exists.
+
+        :param name: Name of the template.
+        :type name: string
+        :return: Modification time, or 0 if there is no such directory.
+        :rtype: float
+        '''
+        loader = getattr(self.env.loader, 'source_loader', self.env.loader)
+        mtime = 0
+        for search_path in getattr(loader, 'searchpath', list()):
+            path = os.path.dirname(os.path.join(search_path, name))
+            while (not os.path.isdir(path) and
+                   len(path) > len(search_path)):
+                path = os.path.dirname(path)
+            if os.path.isdir(path):
+                mtime = max(mtime, os.stat(path).st_mtime)
+        return mtime
@@ -11,6 +11,23 @@ from ssg.log import logger
 from ssg.settings import SETTINGS
 
 
+def is_ignored(name):
+    '''Check if a file or directory is ignored, by its name. Hidden files are
+    always ignored, as are names matching the *IGNORE* setting.
+
+    :param name: Name of the file or directory, without a path.
+    :type name: string
+    :rtype: bool
+    '''
+    # Ignore . and ..
+    if name.startswith('.'):
+        return True
+    for pattern in SETTINGS['IGNORE']:
+        if fnmatch(name, pattern):
+            return True
+    return False
+
+
 def get_files(path, extension):
     '''Get a list of files with extension from path an subdirectories.
 
@@ -21,18 +38,17 @@ def get_files(path, extension):
     '''
     filelist = list()
 
-    logger.debug('Looking in "' + path + '" for files with extension "'
-                 + extension + '"')
-    for entry in os.listdir(path):
-        # Ignore . and ..
-        if not (entry.find('.') == 0):
-            filename = path + "/" + entry
+    logger.debug('Looking in "%s" for files with extension "%s"', path,
+                 extension)
+    for entry in os.scandir(path):
+        if not is_ignored(entry.name):
+            filename = path + "/" + entry.name
             # Process subdirectories
-            if os.path.isdir(filename):
+            if entry.is_dir():
                 filelist.extend(get_files(filename, extension))
             else:
                 if fnmatch(filename, '*' + extension):
-                    logger.debug("Found: " + filename)
+                    logger.debug("Found: %s", filename)
                     filelist.append(filename)
     return(filelist)
 
@@ -49,19 +65,128 @@ def get_dirs(root_dir):
     '''
     dirs = list()
     # Run through all entried in the root dir
-    logger.debug('Getting directories at: ' + root_dir)
-    for entry in os.listdir(root_dir):
-        # If not . or ..
-        if not ((entry.find(".") == 0)):
-            filename = os.path.join(root_dir, entry)
+    logger.debug('Getting directories at: %s', root_dir)
+    for entry in os.scandir(root_dir):
+        if not is_ignored(entry.name):
+            filename = os.path.join(root_dir, entry.name)
             # Is it a directory
-            if os.path.isdir(filename):
-                logger.debug("Adding: " + filename)
+            if entry.is_dir():
+                logger.debug("Adding: %s", filename)
                 dirs.append(filename)
                 dirs.extend(get_dirs(filename))
     return(dirs)
 
 
+class Snapshot(object):
+    '''A listing of a directory, and all directories below it, made once,
+    with the stat results of the files cached.
+
+    The listing is made with :func:`os.scandir`, which finds out what is a
+    directory without calling stat on every entry. Files are listed in the
+    same order as :func:`get_files` lists them.
+    '''
+    def __init__(self, root):
+        '''Constructor, listing the directories.
+
+        :param root: The directory.
+        :type root: string
+        '''
+        self.root = root
+        self.files = list()
+        '''All files, in the order they were found.'''
+        self.dirs = list()
+        '''All directories below the root, in the order they were found.'''
+        self._entries = dict()
+        '''Directory entry of each file.'''
+        self._stats = dict()
+        '''Cached stat results.'''
+        logger.debug('Taking snapshot of: %s', root)
+        self._list(root)
+
+    def _list(self, path):
+        '''List a directory, and the directories below it.
+
+        :param path: The directory.
+        :type path: string
+        '''
+        for entry in os.scandir(path):
+            if is_ignored(entry.name):
+                continue
+            filename = path + '/' + entry.name
+            if entry.is_dir():
+                self.dirs.append(filename)
+                self._list(filename)
+            else:
+                self.files.append(filename)
+                self._entries[filename] = entry
+
+    def get_files(self, extension):
+        '''Get the files with an extension, like :func:`get_files`.
+
+        :param extension: extension to look for
+        :type extension: string
+        :rtype: list
+        '''
+        return [filename for filename in self.files
+                if fnmatch(filename, '*' + extension)]
+
+    def isdir(self, path):
+        '''Check if a path is the root, or a directory below it.
+
+        :param path: The path.
+        :type path: string
+        :rtype: bool
+        '''
+        if path == self.root:
+            return True
+        if not hasattr(self, '_dir_set'):
+            self._dir_set = set(self.dirs)
+        return path in self._dir_set
+
+    def stat(self, filename):
+        '''Get the stat result of a file. Files in the snapshot are only
+        stat\'ed once, other files every time.
+
+        :param filename: The file.
+        :type filename: string
+        :rtype: os.stat_result
+        '''
+        if filename in self._stats:
+            return self._stats[filename]
+        if filename in self._entries:
+            self._stats[filename] = self._entries[filename].stat()
+            return self._stats[filename]
+        return os.stat(filename)
+
+
+_SNAPSHOTS = dict()
+'''Snapshots of the directories used by the build, by path.'''
+
+
+def get_snapshot(root):
+    '''Get the snapshot of a directory, taking it the first time.
+
+    :param root: The directory.
+    :type root: string
+    :rtype: ssg.tools.Snapshot
+    '''
+    if root not in _SNAPSHOTS:
+        _SNAPSHOTS[root] = Snapshot(root)
+    return _SNAPSHOTS[root]
+
+
+def forget_snapshots(root=None):
+    '''Forget the snapshot of a directory, or all snapshots.
+
+    :param root: The directory, or None for all.
+    :type root: string
+    '''
+    if root is None:
+        _SNAPSHOTS.clear()
+    else:
+        _SNAPSHOTS.pop(root, None)
+
+
 def get_datetime(datetime_str):
     '''Get datetime object from a date, time string, formatted according to the
     DATEFORMAT configuration variable.
@@ -69,15 +194,15 @@ def get_datetime(datetime_str):
     :param datatime_str: String containing date and time.
     :type datatime_str: string
     '''
-    logger.debug('Generating datetime object from: ' + datetime_str)
+    logger.debug('Generating datetime object from: %s', datetime_str)
     try:
         ret = datetime.strptime(datetime_str, SETTINGS['DATEFORMAT'])
     except ValueError as exception:
         logger.error('Metadata syntax error:')
-        logger.error('Cannot convert date: ' + datetime_str);
+        logger.error('Cannot convert date: %s', datetime_str);
         raise exception
     
-    logger.debug('datetime object: ' + str(ret))
+    logger.debug('datetime object: %s', ret)
     return(ret)
 
 
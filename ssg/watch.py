@@ -0,0 +1,930 @@
+'''
+Watch mode, rebuilding the site when its files change.
+
+The site is built once, and the context is kept in memory along with the
+Jinja2 environment and the Markdown processor. The content directory, the
+template directory, and ``config.py`` are then watched for changes, using
+inotify on Linux, and polling everywhere else.
+
+When files change, only the affected pages are updated:
+
+- If only the text of a content file changes, the page is rendered again,
+  along with the generated pages that list it.
+- If the meta data of a content file changes, or content files are added or
+  deleted, the generators are run again. The changed files, and the
+  generated pages whose inputs changed, are rendered again, the same way
+  the build state finds them, see :func:`ssg.buildstate.get_inputs`.
+- If a template changes, the pages using it, through ``extends``,
+  ``include``, or ``import``, are rendered again.
+- Other files in the content directory are copied, or deleted.
+- If ``config.py`` changes, the settings are read again, and the whole site
+  is built again.
+
+The output directory is served on localhost. Pages served have a small
+script added, which reloads the page in the browser, once the site has been
+updated.
+'''
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import ssg
+from ssg import generators
+from ssg import settings
+from ssg import writer
+from ssg.buildstate import get_file_hash, get_inputs
+from ssg.context import Content
+from ssg.generator import PostSlice
+from ssg.log import logger
+from ssg.metadata import read_header
+from ssg.metaext import parsers_prepare
+from ssg.settings import SETTINGS
+from ssg.template import TemplateDependencies, get_environment
+from ssg.template import forget_environments
+from ssg.template import get_template_name
+from ssg.tools import get_files, forget_snapshots, is_ignored, die
+
+
+DEBOUNCE = 0.05
+'''Seconds without changes, before a batch of changes is handled.'''
+
+POLL_INTERVAL = 0.1
+'''Seconds between scans, when polling for changes.'''
+
+RELOAD_PATH = '/__ssg__/reload'
+'''Path polled by the browser, to find out when to reload the page.'''
+
+RELOAD_TIMEOUT = 25
+'''Seconds a reload request waits for the site to be updated.'''
+
+RELOAD_SCRIPT = '''<script>
+(function() {
+  function poll() {
+    fetch('%s?version=%d').then(function(response) {
+      return response.text();
+    }).then(function(version) {
+      if (version !== '%d') {
+        location.reload();
+      } else {
+        poll();
+      }
+    }, function() {
+      setTimeout(poll, 1000);
+    });
+  }
+  poll();
+})();
+</script>
+'''
+'''Script added to served pages, to reload them when the site is updated.'''
+
+# Constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+'''Events watched for in each directory.'''
+
+EVENT_HEADER = struct.Struct('iIII')
+'''Header of an inotify event: watch, mask, cookie, and length of name.'''
+
+
+def _walk_dirs(path):
+    '''
+    Get a directory, and all directories below it, except ignored ones.
+
+    :param path: The directory.
+    :type path: string
+    :return: List of directories.
+    :rtype: list
+    '''
+    dirs = [path]
+    for entry in os.scandir(path):
+        if is_ignored(entry.name):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            dirs.extend(_walk_dirs(entry.path))
+    return dirs
+
+
+class InotifyWatcher(object):
+    '''
+    Watch directories for changes, using inotify.
+    '''
+    def __init__(self, dirs, files):
+        '''
+        Constructor.
+
+        :param dirs: Directories to watch, including sub directories.
+        :type dirs: list
+        :param files: Single files to watch.
+        :type files: list
+        :raises OSError: If inotify is not available.
+        '''
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                 use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError('inotify is not available.')
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed.')
+        self._paths = dict()
+        '''Path of each watch descriptor.'''
+        self._recursive = dict()
+        '''True for watches of directories watched with sub directories.'''
+        self._files = set(files)
+        '''Single files to report changes to.'''
+        try:
+            for path in dirs:
+                for watch_dir in _walk_dirs(path):
+                    self._add_watch(watch_dir, True)
+            # Watch the directories of single files, editors often replace
+            # files instead of writing to them
+            for path in self._files:
+                self._add_watch(os.path.dirname(path), False)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, path, recursive):
+        '''
+        Add a watch to a directory.
+
+        :param path: The directory.
+        :type path: string
+        :param recursive: True if changes to all files are reported.
+        :type recursive: bool
+        '''
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path),
+                                          WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno) + ': ' + path)
+        self._paths[wd] = path
+        self._recursive[wd] = self._recursive.get(wd, False) or recursive
+
+    def _read_events(self):
+        '''
+        Read all pending events.
+
+        :return: Set of changed paths, or None if events were lost.
+        :rtype: set
+        '''
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning('Too many changes, rebuilding the site.')
+                    return None
+                if mask & IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    self._recursive.pop(wd, None)
+                    continue
+                if wd not in self._paths or len(name) == 0:
+                    continue
+                path = os.path.join(self._paths[wd], os.fsdecode(name))
+                if not self._recursive[wd]:
+                    if path in self._files:
+                        changed.add(path)
+                    continue
+                if os.path.basename(path).startswith('.'):
+                    continue
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # Watch the new directory, and report what is in it
+                        for watch_dir in _walk_dirs(path):
+                            self._add_watch(watch_dir, True)
+                        changed.update(get_files(path, '.*'))
+                    elif mask & IN_MOVED_FROM:
+                        # The files in it are gone, without any events
+                        return None
+                else:
+                    changed.add(path)
+
+    def wait(self, timeout=None):
+        '''
+        Wait for changes.
+
+        Once a change is seen, the watcher waits until no changes have
+        happened for :data:`DEBOUNCE` seconds, to handle them together.
+
+        :param timeout: Seconds to wait, or None to wait forever.
+        :type timeout: float
+        :return: Set of changed paths, or None if all may have changed.
+        :rtype: set
+        '''
+        changed = set()
+        while True:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            if len(readable) == 0:
+                return changed
+            events = self._read_events()
+            if events is None:
+                return None
+            changed.update(events)
+            if len(changed) > 0:
+                timeout = DEBOUNCE
+
+    def close(self):
+        '''
+        Stop watching.
+        '''
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(object):
+    '''
+    Watch directories for changes, by scanning them repeatedly.
+    '''
+    def __init__(self, dirs, files):
+        '''
+        Constructor.
+
+        :param dirs: Directories to watch, including sub directories.
+        :type dirs: list
+        :param files: Single files to watch.
+        :type files: list
+        '''
+        self._dirs = dirs
+        self._files = files
+        self._stats = self._scan()
+        '''Size and modification time of each file.'''
+
+    def _scan(self):
+        '''
+        Get the size and modification time of all watched files.
+
+        :rtype: dict
+        '''
+        stats = dict()
+        filenames = list(self._files)
+        for path in self._dirs:
+            if os.path.isdir(path):
+                filenames.extend(get_files(path, '.*'))
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            stats[filename] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def _changes(self):
+        '''
+        Scan the files, and find the changes since the last scan.
+
+        :return: Set of changed paths.
+        :rtype: set
+        '''
+        stats = self._scan()
+        changed = set(self._stats.keys() ^ stats.keys())
+        for filename, stat in stats.items():
+            if self._stats.get(filename, stat) != stat:
+                changed.add(filename)
+        self._stats = stats
+        return changed
+
+    def wait(self, timeout=None):
+        '''
+        Wait for changes.
+
+        :param timeout: Seconds to wait, or None to wait forever.
+        :type timeout: float
+        :return: Set of changed paths.
+        :rtype: set
+        '''
+        start = time.monotonic()
+        while True:
+            changed = self._changes()
+            if len(changed) > 0:
+                # Let the changes settle
+                time.sleep(DEBOUNCE)
+                changed.update(self._changes())
+                return changed
+            if timeout is not None and time.monotonic() - start >= timeout:
+                return changed
+            time.sleep(POLL_INTERVAL)
+
+    def close(self):
+        '''
+        Stop watching.
+        '''
+        pass
+
+
+def get_watcher(dirs, files):
+    '''
+    Create a watcher, using inotify if possible.
+
+    :param dirs: Directories to watch, including sub directories.
+    :type dirs: list
+    :param files: Single files to watch.
+    :type files: list
+    :return: The watcher.
+    '''
+    try:
+        watcher = InotifyWatcher(dirs, files)
+        logger.debug('Watching for changes using inotify.')
+        return watcher
+    except (OSError, AttributeError) as exception:
+        logger.debug('Cannot use inotify: %s', exception)
+    logger.info('Polling for changes.')
+    return PollingWatcher(dirs, files)
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    '''
+    Serve the output directory, adding the reload script to pages.
+    '''
+    def log_message(self, format, *args):
+        '''
+        Log requests to the debug log.
+        '''
+        logger.debug('Preview: ' + format, *args)
+
+    def _wait_for_reload(self):
+        '''
+        Answer a reload request, when the site has been updated, or the
+        request times out.
+        '''
+        query = parse_qs(urlsplit(self.path).query)
+        try:
+            version = int(query.get('version', ['0'])[0])
+        except ValueError:
+            version = 0
+        with self.server.updated:
+            self.server.updated.wait_for(
+                lambda: self.server.version != version, RELOAD_TIMEOUT)
+            version = self.server.version
+        body = str(version).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_page(self, filename):
+        '''
+        Send a page, with the reload script added.
+
+        :param filename: The file of the page.
+        :type filename: string
+        '''
+        with open(filename, 'rb') as page_file:
+            body = page_file.read()
+        script = RELOAD_SCRIPT % (RELOAD_PATH, self.server.version,
+                                  self.server.version)
+        script = script.encode('utf-8')
+        index = body.rfind(b'</body>')
+        if index < 0:
+            body += script
+        else:
+            body = body[:index] + script + body[index:]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        '''
+        Handle a GET request.
+        '''
+        if urlsplit(self.path).path == RELOAD_PATH:
+            self._wait_for_reload()
+            return
+        filename = self.translate_path(self.path)
+        if os.path.isdir(filename) and self.path.endswith('/'):
+            filename = os.path.join(filename, 'index.html')
+        if filename.endswith('.html') and os.path.isfile(filename):
+            self._send_page(filename)
+        else:
+            SimpleHTTPRequestHandler.do_GET(self)
+
+
+class PreviewServer(ThreadingHTTPServer):
+    '''
+    HTTP server for previewing the site on localhost.
+    '''
+    daemon_threads = True
+
+    def __init__(self, port, path):
+        '''
+        Constructor.
+
+        :param port: The port to listen on.
+        :type port: int
+        :param path: The directory to serve.
+        :type path: string
+        '''
+        ThreadingHTTPServer.__init__(self, ('localhost', port),
+                                     partial(PreviewHandler, directory=path))
+        self.version = 0
+        '''Incremented each time the site is updated.'''
+        self.updated = threading.Condition()
+        '''Notified when the site is updated.'''
+
+    def reload(self):
+        '''
+        Tell the browsers to reload the pages.
+        '''
+        with self.updated:
+            self.version += 1
+            self.updated.notify_all()
+
+
+def _refers_to(value, contents):
+    '''
+    Check if a value in the local context of a generated page, refers to any
+    of some content.
+
+    :param value: The value.
+    :param contents: Identities of the content.
+    :type contents: set
+    :rtype: bool
+    '''
+    pending = [value]
+    while len(pending) > 0:
+        value = pending.pop()
+        if isinstance(value, dict):
+            if 'metadata' in value:
+                if id(value) in contents:
+                    return True
+            else:
+                pending.extend(value.values())
+        elif isinstance(value, (list, tuple, PostSlice)):
+            pending.extend(value)
+    return False
+
+
+def _keep_content(content):
+    '''
+    Convert content, when its HTML is needed, and keep it.
+
+    :param content: The content.
+    :type content: dict
+    '''
+    ssg._process_file(content)
+
+
+class SiteWatcher(object):
+    '''
+    Keep the site up to date with its files.
+    '''
+    def __init__(self, overrides=None):
+        '''
+        Constructor.
+
+        :param overrides: Settings given on the command line, that are kept
+                          when ``config.py`` is read again.
+        :type overrides: dict
+        '''
+        self.overrides = dict()
+        if overrides is not None:
+            self.overrides = overrides
+        self.headers = dict()
+        '''Meta data header of each content file.'''
+        self.hashes = dict()
+        '''Hash of each content file changed since the site was built.'''
+        self.inputs = dict()
+        '''Fingerprint of the inputs of each generated page, by output
+        file.'''
+        self.memo = dict()
+        '''Fingerprint of the content listed by generated pages, by
+        identity.'''
+        self._set_paths()
+
+    def _set_paths(self):
+        '''
+        Get the paths of the site from the settings.
+        '''
+        self.config_file = os.path.join(SETTINGS['ROOTDIR'], 'config.py')
+        self.content_path = os.path.join(SETTINGS['ROOTDIR'],
+                                         SETTINGS['CONTENTDIR'])
+        self.template_path = os.path.join(SETTINGS['ROOTDIR'],
+                                          SETTINGS['TEMPLATEDIR'])
+        self.output_path = os.path.join(SETTINGS['ROOTDIR'],
+                                        SETTINGS['OUTPUTDIR'])
+
+    def build(self, update=True):
+        '''
+        Build the whole site, and keep the context.
+
+        :param update: Only write updated files.
+        :type update: bool
+        :return: True if the site was built.
+        :rtype: bool
+        '''
+        context = ssg.CONTEXT
+        context.contents = list()
+        try:
+            ssg.run(update)
+            if len(context.contents) == 0:
+                # Nothing changed, read the context without writing anything
+                ssg.scan_content(self.content_path, context)
+                ssg.sanity_checks(context)
+                generators.run(context)
+            if ssg.RENDER_CACHE is None:
+                ssg.RENDER_CACHE = ssg._get_render_cache()
+        except (Exception, SystemExit):
+            logger.error('Build failed, waiting for changes.')
+            context.contents = list()
+            return False
+        for content in context.contents:
+            content.pop('html', None)
+        self.headers = dict()
+        for filename in get_files(self.content_path, '.md'):
+            self.headers[filename] = read_header(filename)
+        self.hashes = dict()
+        self.memo = dict()
+        self.inputs = self._get_inputs(context.contents)
+        return True
+
+    def _get_inputs(self, contents):
+        '''
+        Get the fingerprints of the inputs of the generated pages in some
+        content, see :func:`ssg.buildstate.get_inputs`. The fingerprints of
+        the content they list are kept between updates, and made again only
+        for content that was read again, or whose text changed.
+
+        :param contents: The content.
+        :type contents: list
+        :return: The fingerprints, by output file.
+        :rtype: dict
+        '''
+        inputs = dict()
+        for content in contents:
+            fingerprint = get_inputs(content, self.hashes, self.memo)
+            if fingerprint is not None:
+                inputs[content['metadata']['dst_file']] = fingerprint
+        return inputs
+
+    def _reload_settings(self):
+        '''
+        Read ``config.py`` again.
+
+        :return: True if the settings were read.
+        :rtype: bool
+        '''
+        logger.info('Reading configuration.')
+        try:
+            settings.init(None)
+        except (Exception, SystemExit) as exception:
+            logger.error('Cannot read configuration: %s', exception)
+            return False
+        SETTINGS.update(self.overrides)
+        ssg.CONTEXT.settings = SETTINGS
+        self._set_paths()
+        return True
+
+    def _rescan(self, filenames):
+        '''
+        Read the meta data of content files again, replacing their content.
+
+        Every file is read before any content is replaced, so the context
+        is left alone if any of them has errors.
+
+        :param filenames: The files.
+        :type filenames: set
+        '''
+        contents = dict()
+        for filename in filenames:
+            content = ssg._scan_file(filename)
+            ssg._sanity_check(content)
+            contents[filename] = content
+        context = ssg.CONTEXT
+        # Forget the pages made by the generators, they are made again
+        context.contents = [content for content in context.contents
+                            if content['metadata']['src_file'] != '' and
+                            content['metadata']['src_file'] in self.headers]
+        for index, content in enumerate(context.contents):
+            filename = content['metadata']['src_file']
+            if filename in contents:
+                context.contents[index] = contents.pop(filename)
+        context.contents.extend(contents.values())
+
+    def _get_affected(self, added, removed):
+        '''
+        Get the content files whose meta data depend on the number of files
+        in their directory, when files are added or removed.
+
+        :param added: Files added.
+        :type added: set
+        :param removed: Files removed.
+        :type removed: set
+        :return: The files in the directories of the files, or above.
+        :rtype: set
+        '''
+        dirs = set(os.path.dirname(filename)
+                   for filename in added | removed)
+        affected = set()
+        for filename in self.headers:
+            file_dir = os.path.dirname(filename)
+            for changed_dir in dirs:
+                if (changed_dir == file_dir or
+                        changed_dir.startswith(file_dir + '/')):
+                    affected.add(filename)
+                    break
+        return affected
+
+    def _update_content(self, filenames):
+        '''
+        Update the context with changed content files.
+
+        When the meta data changed, the content that was read again is
+        rendered, along with the generated pages whose inputs changed.
+
+        :param filenames: Content files that changed.
+        :type filenames: set
+        :return: The content to render again.
+        :rtype: list
+        '''
+        added = set()
+        removed = set()
+        text_changed = set()
+        headers = dict()
+        for filename in filenames:
+            if not os.path.isfile(filename):
+                if filename in self.headers:
+                    removed.add(filename)
+                continue
+            headers[filename] = read_header(filename)
+            if filename not in self.headers:
+                added.add(filename)
+            elif headers[filename] == self.headers[filename]:
+                text_changed.add(filename)
+        # Changed text changes the inputs of the generated pages listing it
+        for filename in headers:
+            self.hashes[filename] = get_file_hash(filename)
+        for filename in removed:
+            self.hashes.pop(filename, None)
+        if (len(added) == 0 and len(removed) == 0 and
+                len(text_changed) == len(headers)):
+            # Only the text changed, the meta data of the site is the same
+            contents = [content for content in ssg.CONTEXT.contents
+                        if content['metadata']['src_file'] in text_changed]
+            for content in contents:
+                content.pop('content', None)
+                self.memo.pop(id(content), None)
+            ids = set(id(content) for content in contents)
+            for content in ssg.CONTEXT.contents:
+                if ('context' in content and
+                        _refers_to(content['context'], ids)):
+                    contents.append(content)
+            self.inputs.update(self._get_inputs(contents))
+            return contents
+        # The meta data changed, run the generators again
+        rescan = (set(headers) | self._get_affected(added, removed)) - removed
+        parsers_prepare(sorted((set(self.headers) - removed) | added))
+        self._rescan(rescan)
+        for filename in removed:
+            del self.headers[filename]
+        self.headers.update(headers)
+        # Remove deleted content, and its output
+        contents = list()
+        for content in ssg.CONTEXT.contents:
+            if content['metadata']['src_file'] in removed:
+                self._delete_output(content['metadata']['dst_file'])
+            else:
+                contents.append(content)
+        ssg.CONTEXT.contents = contents
+        generators.run(ssg.CONTEXT)
+        # Forget the fingerprints of content that is gone
+        self.memo = dict((id(content), self.memo[id(content)])
+                         for content in ssg.CONTEXT.contents
+                         if id(content) in self.memo)
+        # Render what was read again, and what lists it
+        inputs = self._get_inputs(ssg.CONTEXT.contents)
+        contents = list()
+        for content in ssg.CONTEXT.contents:
+            metadata = content['metadata']
+            if metadata['src_file'] in rescan:
+                contents.append(content)
+            elif (metadata['dst_file'] in inputs and
+                    inputs[metadata['dst_file']] !=
+                    self.inputs.get(metadata['dst_file'])):
+                contents.append(content)
+        self.inputs = inputs
+        logger.debug('Rendering %s pages, with changed meta data.',
+                     len(contents))
+        return contents
+
+    def _get_template_users(self, templates):
+        '''
+        Get the content rendered using some templates.
+
+        :param templates: Names of the templates.
+        :type templates: set
+        :rtype: list
+        '''
+        dependencies = TemplateDependencies(
+            get_environment(self.template_path))
+        contents = list()
+        for content in ssg.CONTEXT.contents:
+            name = get_template_name(content)
+            used = dependencies.get(name)
+            if used is None or name in templates or len(used & templates) > 0:
+                contents.append(content)
+        return contents
+
+    def _delete_output(self, output_file):
+        '''
+        Delete a file from the output directory, if it is there.
+
+        :param output_file: The file.
+        :type output_file: string
+        '''
+        if os.path.isfile(output_file):
+            logger.info('Deleting file: %s', output_file)
+            os.remove(output_file)
+
+    def _copy_files(self, filenames):
+        '''
+        Copy, or delete, changed files from the content directory.
+
+        :param filenames: The files.
+        :type filenames: set
+        '''
+        for filename in sorted(filenames):
+            if (filename.lower().endswith('.md') and
+                    not SETTINGS['COPYSOURCES']):
+                continue
+            _, output_file = writer._get_copy_destination(filename,
+                                                          self.output_path)
+            if os.path.isfile(filename):
+                writer.copy_file(filename, self.output_path, False)
+            else:
+                self._delete_output(output_file)
+
+    def _render(self, contents):
+        '''
+        Render, and write, some content.
+
+        :param contents: The content, or None for all content.
+        :type contents: list
+        '''
+        if contents is None:
+            contents = ssg.CONTEXT.contents
+        if len(contents) == 0:
+            return
+        render = set(id(content) for content in contents)
+        for content in ssg.CONTEXT.contents:
+            content['metadata']['updated'] = id(content) in render
+        ssg.apply_templates(self.template_path, ssg.CONTEXT)
+        for content in contents:
+            if 'html' in content:
+                writer.file_writer(content)
+                del content['html']
+        logger.info('Wrote %s pages, %s were unchanged.',
+                    writer.WRITE_STATS['written'],
+                    writer.WRITE_STATS['identical'])
+        writer.WRITE_STATS['written'] = 0
+        writer.WRITE_STATS['identical'] = 0
+
+    def update(self, changed):
+        '''
+        Update the site after some files changed.
+
+        :param changed: The changed files, or None if all may have changed.
+        :type changed: set
+        :return: True if the site was updated.
+        :rtype: bool
+        '''
+        forget_snapshots()
+        if changed is None or self.config_file in changed:
+            if changed is not None and not self._reload_settings():
+                return False
+            forget_environments()
+            return self.build(False)
+        if len(ssg.CONTEXT.contents) == 0:
+            # The last build failed
+            return self.build(False)
+        sources = set(filename for filename in changed
+                      if filename.startswith(self.content_path + '/') and
+                      filename.endswith('.md'))
+        files = set(filename for filename in changed
+                    if filename.startswith(self.content_path + '/'))
+        templates = set(
+            os.path.relpath(filename, self.template_path)
+            for filename in changed
+            if filename.startswith(self.template_path + '/'))
+        if len(templates) > 0:
+            # Compiled templates are not checked for changes
+            forget_environments()
+        generated = set(content['metadata']['dst_file']
+                        for content in ssg.CONTEXT.contents
+                        if content['metadata']['src_file'] == '')
+        try:
+            contents = list()
+            if len(sources) > 0:
+                contents = self._update_content(sources)
+            if len(templates) > 0:
+                contents.extend(self._get_template_users(templates))
+            self._render(contents)
+            self._copy_files(files)
+        except Exception as exception:
+            logger.error('%s', exception)
+            if ssg.DEBUG:
+                logger.exception(exception)
+            return False
+        # Remove pages the generators no longer make
+        for content in ssg.CONTEXT.contents:
+            generated.discard(content['metadata']['dst_file'])
+        for output_file in sorted(generated):
+            self._delete_output(output_file)
+        return True
+
+    def watch(self, port):
+        '''
+        Serve the site, and update it when files change, until interrupted.
+
+        :param port: Port of the preview server.
+        :type port: int
+        '''
+        # Keep converted content in memory
+        Content.loader = _keep_content
+        self.build()
+        try:
+            server = PreviewServer(port, self.output_path)
+        except OSError as exception:
+            logger.error('Cannot serve the site: %s', exception)
+            die()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        logger.info('Serving the site at http://localhost:%s/', port)
+        watcher = get_watcher([self.content_path, self.template_path],
+                              [self.config_file])
+        logger.info('Watching for changes, press Ctrl+C to stop.')
+        try:
+            while True:
+                changed = watcher.wait()
+                if changed is not None and len(changed) == 0:
+                    continue
+                start = time.monotonic()
+                if changed is not None:
+                    for filename in sorted(changed):
+                        logger.info('Changed: %s', filename)
+                config_changed = (changed is None or
+                                  self.config_file in changed)
+                if self.update(changed):
+                    server.reload()
+                    logger.info('Updated in %s ms.',
+                                int((time.monotonic() - start) * 1000))
+                if config_changed:
+                    # The directories may have moved
+                    watcher.close()
+                    watcher = get_watcher([self.content_path,
+                                           self.template_path],
+                                          [self.config_file])
+        except KeyboardInterrupt:
+            logger.info('Stopping.')
+        finally:
+            watcher.close()
+            server.shutdown()
+            server.server_close()
+        if SETTINGS['BUILDSTATE']:
+            # Record the changes made while watching
+            Content.loader = ssg._load_content
+            self.build()
+
+
+def watch(port=8000, overrides=None):
+    '''
+    Build the site, serve it on localhost, and update it when files change.
+
+    :param port: Port of the preview server.
+    :type port: int
+    :param overrides: Settings given on the command line.
+    :type overrides: dict
+    '''
+    SiteWatcher(overrides).watch(port)
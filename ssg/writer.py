@@ -4,13 +4,44 @@ The writers takes care of creating the final static output.
 The process is this.
  - Generate output files from a list of contexts.
  - Copy all other files in the content directory to the output directory.
- - Delete *anything* that is not present in the content directory
+ - Delete the files written by the previous build, that this build did not
+   write.
+
+The files written by each build are recorded in the build state, or, when
+the *BUILDSTATE* setting is False, in a manifest file, see the *MANIFEST*
+setting. Only files from the previous build are deleted, other files in the
+output directory are left alone. If the previous build is not known, the
+output directory is scanned, and *anything* that is not present in the
+content directory is deleted.
+
+Files that are not content are copied the way the *ASSETCOPY* setting says.
+Hard links, and reflinks, take no time, and no space, whatever the size of
+the files. If a mode is not supported, for instance when the output is on
+another file system, the files are copied instead.
 '''
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
 import os
 import shutil
+import threading
+import time
 from ssg.log import logger
 from ssg.settings import SETTINGS
-from ssg.tools import get_files, get_dirs, die
+from ssg.tools import Snapshot, get_snapshot, die
+from ssg.buildstate import get_file_hash, get_inputs
+from ssg import pagereport
+
+
+FICLONE = 0x40049409
+'''The Linux ioctl cloning a file.'''
+
+
+WRITE_STATS = {'written': 0, 'identical': 0}
+'''Number of pages written, and left alone because they were identical.'''
+
+
+_STATS_LOCK = threading.Lock()
+'''Lock of WRITE_STATS, which is updated from the threads of the IOEngine.'''
 
 
 def _create_dir(path):
@@ -21,49 +52,203 @@ def _create_dir(path):
     :type path: string
     '''
     if not os.path.isdir(path):
-        logger.debug('Creating path: ' + path)
-        os.makedirs(path, mode=0o755)
+        logger.debug('Creating path: %s', path)
+        os.makedirs(path, mode=0o755, exist_ok=True)
+
+
+def count_page(written):
+    '''Count a page in WRITE_STATS.
+
+    :param written: True if the page was written, False if it was left
+                    alone, because it was identical.
+    :type written: bool
+    '''
+    with _STATS_LOCK:
+        if written:
+            WRITE_STATS['written'] += 1
+        else:
+            WRITE_STATS['identical'] += 1
+
+
+class IOEngine(object):
+    '''
+    Run the writes, copies, and deletes of the output on a pool of threads,
+    so that these overlap, instead of waiting for each other on slow storage.
+    The size of the pool is the *IOJOBS* setting. With one job everything is
+    run right away, in order.
+
+    Each output directory is only created once.
+    '''
+    def __init__(self, jobs=1):
+        '''
+        Constructor.
+
+        :param jobs: Number of threads.
+        :type jobs: int
+        '''
+        self.files = 0
+        '''Number of files written, or copied.'''
+        self.bytes = 0
+        '''Number of bytes written, or copied.'''
+        self._dirs = set()
+        '''Directories created, or known to exist.'''
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._executor = None
+        if jobs > 1:
+            self._executor = ThreadPoolExecutor(max_workers=jobs)
+
+    def create_dir(self, path):
+        '''
+        Create a directory, and those above it, unless it was already done.
+
+        :param path: The directory.
+        :type path: string
+        '''
+        if path in self._dirs:
+            return
+        if not os.path.isdir(path):
+            logger.debug('Creating path: %s', path)
+            os.makedirs(path, mode=0o755, exist_ok=True)
+        with self._lock:
+            self._dirs.add(path)
+
+    def submit(self, function, *args):
+        '''
+        Run a function on the pool.
+
+        :param function: The function.
+        :type function: callable
+        :return: The future result of the function.
+        :rtype: concurrent.futures.Future
+        '''
+        if self._executor is not None:
+            return self._executor.submit(function, *args)
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except BaseException as exception:
+            future.set_exception(exception)
+        return future
+
+    def count(self, size):
+        '''
+        Count a file written, or copied.
+
+        :param size: Size of the file.
+        :type size: int
+        '''
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+
+    def close(self):
+        '''
+        Wait for everything to finish, and log the throughput.
+        '''
+        if self._executor is not None:
+            self._executor.shutdown()
+        elapsed = max(time.perf_counter() - self._start, 1e-6)
+        megabytes = self.bytes / (1024 * 1024)
+        logger.info('Wrote %s files, %.1f MB, in %.2f s '
+                    '(%.0f files/s, %.1f MB/s).', self.files, megabytes,
+                    elapsed, self.files / elapsed, megabytes / elapsed)
+
+
+def _get_templates(content, dependencies):
+    '''
+    Get the templates used by some content, and record them in the
+    *templates* key of the content.
+
+    :param content: The content.
+    :type content: dict
+    :param dependencies: Dependencies of the site templates.
+    :type dependencies: ssg.template.TemplateDependencies
+    :return: Set of template names, or None if only known when rendering.
+    :rtype: set
+    '''
+    from ssg.template import get_template_name
+    templates = dependencies.get(get_template_name(content))
+    if templates is None:
+        content['templates'] = None
+    else:
+        content['templates'] = sorted(templates)
+    return templates
+
+
+def _get_template_time(content, dependencies, newest_template):
+    '''
+    Get the modification time of the newest template used by some content,
+    and record the templates used in the *templates* key of the content.
+
+    :param content: The content.
+    :type content: dict
+    :param dependencies: Dependencies of the site templates.
+    :type dependencies: ssg.template.TemplateDependencies
+    :param newest_template: Modification time of the newest of all templates.
+    :type newest_template: float
+    :return: Modification time, or None if the template is missing.
+    :rtype: float
+    '''
+    templates = _get_templates(content, dependencies)
+    if templates is None:
+        # Depends on templates only known when rendering, assume all
+        return newest_template
+    if len(templates) == 0:
+        return None
+    return max(dependencies.get_mtime(name) for name in templates)
 
 
 def _check_updated(context):
     '''
     Check which files need updating.
 
+    A page is updated if its source, the configuration, or any template it
+    uses has changed. Generated pages are also updated if any content has
+    changed.
+
     :param context: Site context.
     :type context: ssg.context.Context
     '''
+    # Imported here, Jinja2 is only needed when something is built
+    from ssg.template import TemplateDependencies, get_environment
     logger.debug('Checking which files need updating.')
     # Assume nothin' needs to be updated
     content_upd = False
+    template_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['TEMPLATEDIR'])
+    dependencies = TemplateDependencies(get_environment(template_path))
     # Get template modification times
-    template_files = get_files(os.path.join(SETTINGS['ROOTDIR'],
-                                            SETTINGS['TEMPLATEDIR']),
-                               '.html')
+    templates = get_snapshot(template_path)
+    content_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['CONTENTDIR'])
+    sources = get_snapshot(content_path)
     newest_template = 0
-    for fullpath in template_files:
-        mtime = os.stat(fullpath).st_mtime
+    for fullpath in templates.get_files('.html'):
+        mtime = templates.stat(fullpath).st_mtime
         if newest_template < mtime:
             newest_template = mtime
 
     # Get the config file modification time
     config_time = os.stat(SETTINGS['ROOTDIR'] + '/config.py').st_mtime
-    # Update all content older than the newest template
+    # Update all content older than its newest template
     # Get changed content
     # Run through all content.
     for content in context.contents:
         # If file has a source it is not generated.
         if not content['metadata']['src_file'] == '':
-            logger.debug('Checking: ' + content['metadata']['src_file'])
+            logger.debug('Checking: %s', content['metadata']['src_file'])
             # Get modification time of source and destination.
-            src_mtime = os.stat(content['metadata']['src_file']).st_mtime
+            src_mtime = sources.stat(
+                content['metadata']['src_file']).st_mtime
             if os.path.isfile(content['metadata']['dst_file']):
                 dst_mtime = os.stat(content['metadata']['dst_file']).st_mtime
             else:
                 # Make sure the target is updated if it does not exist
                 dst_mtime = 0
-            logger.debug('Source mtime: ' + str(src_mtime))
-            logger.debug('Destination mtime: ' + str(dst_mtime))
-            logger.debug('Newest template mtime: ' + str(newest_template))
+            template_time = _get_template_time(content, dependencies,
+                                               newest_template)
+            logger.debug('Source mtime: %s', src_mtime)
+            logger.debug('Destination mtime: %s', dst_mtime)
+            logger.debug('Newest template mtime: %s', template_time)
             # Check if destination is older than newest template
             if dst_mtime < config_time:
                 logger.debug('Destination needs updating. Config change.')
@@ -71,7 +256,7 @@ def _check_updated(context):
                 content_upd = True
                 content['metadata']['updated'] = True
             # Check if destination is older than newest template
-            if dst_mtime < newest_template:
+            if template_time is None or dst_mtime < template_time:
                 logger.debug('Destination needs updating. Template change.')
                 # Content updated
                 content_upd = True
@@ -85,61 +270,268 @@ def _check_updated(context):
             else:
                 if 'updated' not in content['metadata'].keys():
                     content['metadata']['updated'] = False
-            # Check if template is newer than
     # If content is updated write generated pages.
     # Run through all content.
     for content in context.contents:
         # If file has no source it is generated
         if content['metadata']['src_file'] == '':
-            if content_upd:
-                logger.debug('"' + content['metadata']['title'] +
-                             '" needs updating.')
+            if os.path.isfile(content['metadata']['dst_file']):
+                dst_mtime = os.stat(content['metadata']['dst_file']).st_mtime
+            else:
+                dst_mtime = 0
+            template_time = _get_template_time(content, dependencies,
+                                               newest_template)
+            if (content_upd or dst_mtime < config_time or
+                    template_time is None or dst_mtime < template_time):
+                logger.debug('"%s" needs updating.',
+                             content['metadata']['title'])
                 content['metadata']['updated'] = True
             else:
                 content['metadata']['updated'] = False
 
 
-def file_writer(content):
-    '''Write a file to the output directory.
+def _check_templates_changed(templates, plan):
+    '''
+    Check if any of the templates used by some content has changed.
+
+    :param templates: Templates used by the content.
+    :type templates: set
+    :param plan: The plan of the build.
+    :type plan: ssg.buildstate.BuildPlan
+    :rtype: bool
+    '''
+    if templates is None:
+        # Depends on templates only known when rendering, assume all
+        return len(plan.templates_changed) > 0
+    if len(templates) == 0:
+        # Missing template, let rendering report it
+        return True
+    return len(templates & plan.templates_changed) > 0
+
+
+def _check_updated_plan(context, plan):
+    '''
+    Check which files need updating, using the build state.
+
+    A page is updated if it was not written by the previous build, or if its
+    source, or any template it uses, has changed. Generated pages are also
+    updated if the fingerprint of their inputs has changed.
+
+    :param context: Site context.
+    :type context: ssg.context.Context
+    :param plan: The plan of the build.
+    :type plan: ssg.buildstate.BuildPlan
+    '''
+    # Imported here, Jinja2 is only needed when something is built
+    from ssg.template import TemplateDependencies, get_environment
+    logger.debug('Checking which files need updating, from build state.')
+    template_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['TEMPLATEDIR'])
+    dependencies = TemplateDependencies(get_environment(template_path))
+    memo = dict()
+    for content in context.contents:
+        metadata = content['metadata']
+        templates = _get_templates(content, dependencies)
+        if plan.full:
+            metadata['updated'] = True
+        elif metadata['dst_file'] not in plan.pages:
+            logger.debug('Destination needs updating. New page.')
+            metadata['updated'] = True
+        elif metadata['src_file'] in plan.changed:
+            logger.debug('Destination needs updating. Source change.')
+            metadata['updated'] = True
+        elif _check_templates_changed(templates, plan):
+            logger.debug('Destination needs updating. Template change.')
+            metadata['updated'] = True
+        elif (metadata['src_file'] == '' and
+              get_inputs(content, plan.hashes, memo) !=
+              plan.pages[metadata['dst_file']]['inputs']):
+            logger.debug('"%s" needs updating.', metadata['title'])
+            metadata['updated'] = True
+        else:
+            metadata['updated'] = False
+
+
+def check_updated(context, update=True, plan=None):
+    '''
+    Mark the content that needs to be written, by setting the *updated* key
+    in the meta data.
+
+    :param context: Site context.
+    :type context: ssg.context.Context
+    :param update: Only mark updated files.
+    :type update: bool
+    :param plan: The plan of the build, if the build state is used.
+    :type plan: ssg.buildstate.BuildPlan
+    '''
+    if plan is not None:
+        if not update:
+            plan.full = True
+        _check_updated_plan(context, plan)
+    elif update:
+        # Check which needs an update.
+        _check_updated(context)
+    else:
+        # Update all
+        for content in context.contents:
+            content['metadata']['updated'] = True
+
+
+def _prepare_output(content, engine=None):
+    '''Get the output file name of some content, and create its directory.
 
     :param content: The content to write.
     :type content: dict
-    :return: Filename of the written file.
+    :param engine: The engine creating the directory, if any.
+    :type engine: ssg.writer.IOEngine
+    :return: Filename of the output file.
     :rtype: string
     '''
     # Generate ouput file name if none is set
     if content['metadata']['dst_file'] == '':
-        logger.error('No destination file name for: ' +
+        logger.error('No destination file name for: %s',
                      content['metadata']['title'])
         die()
     else:
         output_filename = content['metadata']['dst_file']
     # Get the path of the output
     output_path, _ = os.path.split(output_filename)
-    logger.debug('Saving to path: ' + output_path)
-    _create_dir(output_path)
+    logger.debug('Saving to path: %s', output_path)
+    if engine is None:
+        _create_dir(output_path)
+    else:
+        engine.create_dir(output_path)
+    return output_filename
 
-    with open(output_filename, 'w', encoding='utf8') as output_file:
-        logger.info('Saving to: ' + output_filename)
-        output_file.write(content['html'])
-    output_file.close()
+
+def get_previous_hash(content, plan):
+    '''Get the hash of the page written by the previous build, from the
+    build state.
+
+    :param content: The content to write.
+    :type content: dict
+    :param plan: The plan of the build, or None.
+    :type plan: ssg.buildstate.BuildPlan
+    :return: The hash, or None if not known.
+    :rtype: string
+    '''
+    if plan is None:
+        return None
+    page = plan.pages.get(content['metadata']['dst_file'])
+    if page is None:
+        return None
+    return page['out_hash']
+
+
+def _is_identical(output_filename, size, output_hash, previous_hash):
+    '''Check if a file already has the contents about to be written.
+
+    :param output_filename: The file.
+    :type output_filename: string
+    :param size: Size of the new contents.
+    :type size: int
+    :param output_hash: Hash of the new contents.
+    :type output_hash: string
+    :param previous_hash: Hash of the file from the build state, or None to
+                          hash the file.
+    :type previous_hash: string
+    :rtype: bool
+    '''
+    try:
+        if os.stat(output_filename).st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    if previous_hash is None:
+        previous_hash = get_file_hash(output_filename)
+    return previous_hash == output_hash
+
+
+def stream_writer(content, stream, previous_hash=None):
+    '''Write a page to the output directory, as it is rendered, without
+    keeping the whole page in memory.
+
+    The page is written to a temporary file, which replaces the output file
+    only if the contents differ. The page is not counted in WRITE_STATS, as
+    this may run in a worker process. The caller counts it, using
+    :func:`count_page`.
+
+    :param content: The content to write.
+    :type content: dict
+    :param stream: The rendering template.
+    :type stream: jinja2.environment.TemplateStream
+    :param previous_hash: Hash of the existing output file, if known.
+    :type previous_hash: string
+    :return: True if the file was written, False if it was identical.
+    :rtype: bool
+    '''
+    output_filename = _prepare_output(content)
+    tmp_filename = output_filename + '.tmp'
+    digest = hashlib.sha1()
+    size = 0
+    with open(tmp_filename, 'wb') as output_file:
+        for chunk in stream:
+            chunk = chunk.encode('utf8')
+            digest.update(chunk)
+            size += len(chunk)
+            output_file.write(chunk)
+    content['output_hash'] = digest.hexdigest()
+    pagereport.record(content, size=size)
+    if _is_identical(output_filename, size, content['output_hash'],
+                     previous_hash):
+        os.remove(tmp_filename)
+        logger.debug('Unchanged: %s', output_filename)
+        return False
+    logger.info('Saving to: %s', output_filename)
+    os.replace(tmp_filename, output_filename)
+    return True
+
+
+def file_writer(content, previous_hash=None, engine=None):
+    '''Write a file to the output directory.
+
+    The file is left untouched if it already has the same contents.
+
+    :param content: The content to write.
+    :type content: dict
+    :param previous_hash: Hash of the existing output file, if known.
+    :type previous_hash: string
+    :param engine: The engine writing the output, if any.
+    :type engine: ssg.writer.IOEngine
+    :return: Filename of the written file.
+    :rtype: string
+    '''
+    output_filename = _prepare_output(content, engine)
+    html = content['html'].encode('utf8')
+    content['output_hash'] = hashlib.sha1(html).hexdigest()
+    pagereport.record(content, size=len(html))
+    if _is_identical(output_filename, len(html), content['output_hash'],
+                     previous_hash):
+        logger.debug('Unchanged: %s', output_filename)
+        count_page(False)
+        return output_filename
+
+    # Replace the file, instead of writing into it
+    tmp_filename = output_filename + '.tmp'
+    with open(tmp_filename, 'wb') as output_file:
+        logger.info('Saving to: %s', output_filename)
+        output_file.write(html)
+    os.replace(tmp_filename, output_filename)
+    count_page(True)
+    if engine is not None:
+        engine.count(len(html))
     return output_filename
 
 
-def copy_file(src, dst, update=True):
-    '''Copy a file, and create any target directories needed.
+def _get_copy_destination(src, dst):
+    '''Get where a file from the content directory is copied to.
 
     :param src: The source file.
     :type src: string
     :param dst: The destination path.
     :type dst: string
-    :param update: Only copy updated files.
-    :type update: bool
-    :return: Filename of the destination.
-    :rtype: string
+    :return: Directory relative to the content directory, and destination.
+    :rtype: tuple
     '''
-    # Get source file modification time
-    src_mtime = os.stat(src).st_mtime
     # Get content path
     content_path = os.path.join(SETTINGS['ROOTDIR'],
                                 SETTINGS['CONTENTDIR'])
@@ -147,7 +539,134 @@ def copy_file(src, dst, update=True):
     relpath = os.path.relpath(src, content_path)
     # Isolate the path from the file name
     relpath, _ = os.path.split(relpath)
-    output_file = os.path.join(dst, relpath, os.path.basename(src))
+    return relpath, os.path.join(dst, relpath, os.path.basename(src))
+
+
+def _copy_input(src, dst, update, plan, engine=None):
+    '''Copy a file from the content directory, using the build state to
+    find out if it has changed, if available.
+
+    :param src: The source file.
+    :type src: string
+    :param dst: The destination path.
+    :type dst: string
+    :param update: Only copy updated files.
+    :type update: bool
+    :param plan: The plan of the build, if the build state is used.
+    :type plan: ssg.buildstate.BuildPlan
+    :param engine: The engine copying the file, if any.
+    :type engine: ssg.writer.IOEngine
+    :return: Filename of the destination.
+    :rtype: string
+    '''
+    if plan is None:
+        return copy_file(src, dst, update, engine)
+    _, output_file = _get_copy_destination(src, dst)
+    if (update and not plan.full and src not in plan.changed and
+            output_file in plan.outputs):
+        logger.debug('Skipping: %s', src)
+        return output_file
+    return copy_file(src, dst, False, engine)
+
+
+def _reflink(src, dst):
+    '''Clone a file, sharing its data blocks, using the FICLONE ioctl.
+
+    :param src: The source file.
+    :type src: string
+    :param dst: The destination file.
+    :type dst: string
+    '''
+    import fcntl
+    with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+        fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    shutil.copystat(src, dst)
+
+
+def _copy_file_range(src, dst):
+    '''Copy a file in the kernel, using copy_file_range.
+
+    :param src: The source file.
+    :type src: string
+    :param dst: The destination file.
+    :type dst: string
+    '''
+    with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+        size = os.fstat(src_file.fileno()).st_size
+        while size > 0:
+            copied = os.copy_file_range(src_file.fileno(),
+                                        dst_file.fileno(), size)
+            if copied == 0:
+                break
+            size -= copied
+    shutil.copystat(src, dst)
+
+
+_ASSET_COPIERS = {
+    'hardlink': os.link,
+    'reflink': _reflink,
+    'copy_file_range': _copy_file_range
+}
+'''Functions copying a file, for each *ASSETCOPY* mode but *copy*.'''
+
+
+_FAILED_MODES = set()
+'''*ASSETCOPY* modes that failed, and are not tried again.'''
+
+
+def copy_asset(src, dst):
+    '''Copy a file, the way the *ASSETCOPY* setting says. If that fails, the
+    file is copied.
+
+    The destination is deleted first, so that a hard link is never written
+    through to the source.
+
+    :param src: The source file.
+    :type src: string
+    :param dst: The destination file.
+    :type dst: string
+    :return: Filename of the destination.
+    :rtype: string
+    '''
+    if os.path.lexists(dst):
+        os.remove(dst)
+    mode = SETTINGS['ASSETCOPY']
+    if mode != 'copy' and mode not in _FAILED_MODES:
+        if mode not in _ASSET_COPIERS:
+            logger.warning('Unknown asset copy mode "%s", copying files.',
+                           mode)
+            _FAILED_MODES.add(mode)
+        else:
+            try:
+                _ASSET_COPIERS[mode](src, dst)
+                return dst
+            except (OSError, AttributeError, ImportError) as exception:
+                logger.warning('Asset copy mode "%s" failed, copying files: '
+                               '%s', mode, exception)
+                _FAILED_MODES.add(mode)
+                if os.path.lexists(dst):
+                    os.remove(dst)
+    return shutil.copy2(src, dst)
+
+
+def copy_file(src, dst, update=True, engine=None):
+    '''Copy a file, and create any target directories needed.
+
+    :param src: The source file.
+    :type src: string
+    :param dst: The destination path.
+    :type dst: string
+    :param update: Only copy updated files.
+    :type update: bool
+    :param engine: The engine copying the file, if any.
+    :type engine: ssg.writer.IOEngine
+    :return: Filename of the destination.
+    :rtype: string
+    '''
+    # Get source file modification time
+    src_stat = os.stat(src)
+    src_mtime = src_stat.st_mtime
+    relpath, output_file = _get_copy_destination(src, dst)
     if os.path.isfile(output_file):
         dst_mtime = os.stat(output_file).st_mtime
     else:
@@ -157,118 +676,360 @@ def copy_file(src, dst, update=True):
     if (src_mtime > dst_mtime) or (update is False):
         # Add destination path
         output_path = os.path.join(dst, relpath)
-        _create_dir(output_path)
-        logger.info('Copying "' + src + '" to "' + output_path + '"')
-        return shutil.copy2(src, output_path)
+        logger.info('Copying "%s" to "%s"', src, output_path)
+        if engine is None:
+            _create_dir(output_path)
+        else:
+            engine.create_dir(output_path)
+        copy_asset(src, output_file)
+        if engine is not None:
+            engine.count(src_stat.st_size)
+        return output_file
     else:
-        logger.debug('Skipping: ' + src)
+        logger.debug('Skipping: %s', src)
         # Return destination anyway, to have a list of supposedly copied files
         return output_file
 
 
-def cleanup_destination(output_path, written_files):
+def _get_manifest_file():
+    '''Get the file name of the manifest.
+
+    :rtype: string
+    '''
+    return os.path.join(SETTINGS['ROOTDIR'], SETTINGS['MANIFEST'])
+
+
+def read_manifest(output_path):
+    '''Read the manifest of the files written by the previous build.
+
+    The manifest is a text file. The first line is the output path, the
+    rest are the written files, relative to it.
+
+    :param output_path: Path to output files.
+    :type output_path: string
+    :return: The files, or None if there is no manifest for the output path.
+    :rtype: set
+    '''
+    try:
+        with open(_get_manifest_file(), 'r', encoding='utf-8') as manifest:
+            lines = manifest.read().splitlines()
+    except FileNotFoundError:
+        logger.debug('No manifest.')
+        return None
+    if len(lines) == 0 or lines[0] != os.path.normpath(output_path):
+        logger.debug('Manifest is for another output path.')
+        return None
+    return set(os.path.join(lines[0], line) for line in lines[1:])
+
+
+def save_manifest(output_path, written_files):
+    '''Save the manifest of the files written by this build.
+
+    :param output_path: Path to output files.
+    :type output_path: string
+    :param written_files: Files that was created by this run.
+    :type written_files: list
+    '''
+    output_path = os.path.normpath(output_path)
+    lines = [output_path]
+    lines.extend(sorted(set(os.path.relpath(filename, output_path)
+                            for filename in written_files)))
+    filename = _get_manifest_file()
+    # Replace the old manifest in one go
+    with open(filename + '.tmp', 'w', encoding='utf-8') as manifest:
+        manifest.write('\n'.join(lines) + '\n')
+    os.replace(filename + '.tmp', filename)
+    logger.debug('Saved manifest of %s files.', len(lines) - 1)
+
+
+def _remove_manifest():
+    '''Remove the manifest, which is out of date while the build state is
+    used.
+    '''
+    try:
+        os.remove(_get_manifest_file())
+        logger.debug('Removed manifest.')
+    except FileNotFoundError:
+        pass
+
+
+def get_previous_outputs(output_path, plan=None):
+    '''Get the files written by the previous build, from the build state,
+    or from the manifest, when the build state is not used.
+
+    :param output_path: Path to output files.
+    :type output_path: string
+    :param plan: The plan of the build, if the build state is used.
+    :type plan: ssg.buildstate.BuildPlan
+    :return: The files, or None if they are not known.
+    :rtype: set
+    '''
+    if plan is None:
+        return read_manifest(output_path)
+    if plan.outputs_recorded:
+        return plan.outputs
+    return None
+
+
+def get_outputs(input_path, context):
+    '''Get the files a build writes, without writing them.
+
+    :param input_path: Path with input files.
+    :type input_path: string
+    :param context: Context to write.
+    :type context: ssg.context.Context
+    :return: Files written by a build.
+    :rtype: list
+    '''
+    output_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['OUTPUTDIR'])
+    outputs = [content['metadata']['dst_file']
+               for content in context.contents]
+    for filename in get_snapshot(input_path).get_files('.*'):
+        if filename.lower().endswith('.md') and not SETTINGS['COPYSOURCES']:
+            continue
+        outputs.append(_get_copy_destination(filename, output_path)[1])
+    return outputs
+
+
+def _delete_file(filename, dry_run):
+    '''Delete a file, or report that it would be deleted.
+
+    :param filename: The file.
+    :type filename: string
+    :param dry_run: Only report the file.
+    :type dry_run: bool
+    '''
+    if dry_run:
+        logger.info('Would delete file: %s', filename)
+    else:
+        logger.info('Deleting file: %s', filename)
+        os.remove(filename)
+
+
+def _delete_dir(path, dry_run):
+    '''Delete an empty directory, or report that it would be deleted.
+
+    :param path: The directory.
+    :type path: string
+    :param dry_run: Only report the directory.
+    :type dry_run: bool
+    '''
+    if dry_run:
+        logger.info('Would delete directory: %s', path)
+    else:
+        logger.info('Deleting directory: %s', path)
+        os.rmdir(path)
+
+
+def _delete_files(filenames, dry_run, engine):
+    '''Delete files, or report that they would be deleted.
+
+    :param filenames: The files.
+    :type filenames: list
+    :param dry_run: Only report the files.
+    :type dry_run: bool
+    :param engine: The engine deleting the files, if any.
+    :type engine: ssg.writer.IOEngine
+    '''
+    if engine is None:
+        for filename in filenames:
+            _delete_file(filename, dry_run)
+        return
+    futures = [engine.submit(_delete_file, filename, dry_run)
+               for filename in filenames]
+    for future in futures:
+        future.result()
+
+
+def _cleanup_previous(output_path, written_files, previous_files, dry_run,
+                      engine):
+    '''Delete files written by the previous build, that was not written by
+    this build, and any directories left empty.
+
+    :param output_path: Path to output files.
+    :type output_path: string
+    :param written_files: Files that was created by this run.
+    :type written_files: set
+    :param previous_files: Files written by the previous build.
+    :type previous_files: set
+    :param dry_run: Only report what would be deleted.
+    :type dry_run: bool
+    :param engine: The engine deleting the files, if any.
+    :type engine: ssg.writer.IOEngine
+    '''
+    dirs = set()
+    deleted = set()
+    for filename in sorted(previous_files - written_files):
+        if os.path.isfile(filename):
+            deleted.add(filename)
+        # Remember all directories up to the output path
+        output_dir = os.path.dirname(filename)
+        while output_dir.startswith(output_path + '/'):
+            dirs.add(output_dir)
+            output_dir = os.path.dirname(output_dir)
+    _delete_files(sorted(deleted), dry_run, engine)
+    # Delete sub directories first
+    for output_dir in sorted(dirs, reverse=True):
+        if not os.path.isdir(output_dir):
+            continue
+        # Empty, once the deleted files and directories are gone
+        if all(os.path.join(output_dir, name) in deleted
+               for name in os.listdir(output_dir)):
+            _delete_dir(output_dir, dry_run)
+            deleted.add(output_dir)
+
+
+def cleanup_destination(output_path, written_files, previous_files=None,
+                        dry_run=False, engine=None):
     '''Delete any files in the destination directory that are no longer in
     the source directory. The algorithm replaces ".md" with ".html."
 
+    If the files written by the previous build are known, from the build
+    state, or the manifest, only these are considered, and the output
+    directory is not scanned.
+
     :param output_path: Path to output files.
     :type output_path: string
     :param written_files: list of files that was created by this run.
     :type written_files: list
+    :param previous_files: Files written by the previous build, or None.
+    :type previous_files: set
+    :param dry_run: Only report what would be deleted.
+    :type dry_run: bool
+    :param engine: The engine deleting the files, if any.
+    :type engine: ssg.writer.IOEngine
     :return: Filename of the destination.
     :rtype: string
     '''
     logger.info('Cleaning output directory.')
+    output_path = os.path.normpath(output_path)
+    written_files = set(os.path.normpath(filename)
+                        for filename in written_files)
+    if previous_files is not None:
+        previous_files = set(os.path.normpath(filename)
+                             for filename in previous_files)
+        _cleanup_previous(output_path, written_files, previous_files,
+                          dry_run, engine)
+        return
     # Get files in output path
     logger.debug("Getting all files in the output path.")
-    current_files = get_files(output_path, '.*')
+    output = Snapshot(output_path)
+    current_files = output.get_files('.*')
     # Create a list of all files to delete
     delete_list = list()
     # Run through all source filed
     for filename in current_files:
         # Check if file was created by this run
         if filename not in written_files:
-            logger.debug('Adding: ' + filename)
+            logger.debug('Adding: %s', filename)
             delete_list.append(filename)
         else:
-            logger.debug('Skipping: ' + filename)
+            logger.debug('Skipping: %s', filename)
     # Delete the files
-    for filename in delete_list:
-        logger.info('Deleting file: ' + filename)
-        os.remove(filename)
+    _delete_files(delete_list, dry_run, engine)
     # Move on to cleaning up any deleted directories.
     # Get directories in output output_dir.
-    dst_dirs = get_dirs(output_path + '/')
+    dst_dirs = output.dirs
+    sources = get_snapshot(os.path.join(SETTINGS['ROOTDIR'],
+                                        SETTINGS['CONTENTDIR']))
     # Create a list for the directories to delete
     dirlist = list()
     # Run trough all directories in the output
     for dst_dir in dst_dirs:
-        if os.path.isdir(dst_dir):
-            # Get path starting from content
-            output_path = os.path.join(SETTINGS['ROOTDIR'],
-                                       SETTINGS['OUTPUTDIR'])
-            reldir = os.path.relpath(dst_dir, output_path)
-            content_path = os.path.join(SETTINGS['ROOTDIR'],
-                                        SETTINGS['CONTENTDIR'],
-                                        reldir)
-            if not os.path.isdir(content_path):
-                dirlist.append(dst_dir)
+        # Get path starting from content
+        reldir = os.path.relpath(dst_dir, output_path)
+        if not sources.isdir(os.path.join(sources.root, reldir)):
+            dirlist.append(dst_dir)
     # Delete directories backwards to make sure subdirectories go first
     for output_dir in reversed(dirlist):
-        # Do not try to delete the output directory
-        if not output_dir == os.path.join(SETTINGS['ROOTDIR'],
-                                          SETTINGS['OUTPUTDIR']):
-            logger.info('Deleting directory: ' + output_dir)
-            os.rmdir(output_dir)
+        _delete_dir(output_dir, dry_run)
 
 
-def write(input_path, context, update=True):
+def write(input_path, context, update=True, plan=None):
     '''Write and copy all output files into place.
 
+    Pages already written by :func:`stream_writer` have no *html* key, and
+    are left alone.
+
     :param input_path: Path with input files.
     :type input_path: string
     :param context: Context to write.
     :type context: dict
     :param update: Only write updated files.
     :type update: bool
+    :param plan: The plan of the build, if the build state is used.
+    :type plan: ssg.buildstate.BuildPlan
+    :return: Files written, or kept, by this run.
+    :rtype: list
     '''
     # Create a list of input files
-    input_files = get_files(input_path, '.*')
+    if plan is None:
+        input_files = get_snapshot(input_path).get_files('.*')
+    else:
+        input_files = plan.get_files('.*')
     # Create a list of written files
     written_files = list()
-    if update:
-        # Check which needs an update.
-        _check_updated(context)
-    else:
-        # Update all
-        for content in context.contents:
-            content['metadata']['updated'] = True
-    # Write all content
-    logger.info('Saving HTML output.')
+    # Check which needs an update, unless it has already been done
     for content in context.contents:
-        # Check if file need to be writte.
-        if content['metadata']['updated']:
-            written_files.append(file_writer(content).strip())
-        else:
-            # Add to list to prevent deletion
-            written_files.append(content['metadata']['dst_file'])
+        if 'updated' not in content['metadata']:
+            check_updated(context, update, plan)
+            break
+    engine = IOEngine(SETTINGS['IOJOBS'])
+    try:
+        # Files written, or copied, by the engine
+        futures = list()
+        # Write all content
+        logger.info('Saving HTML output.')
+        for content in context.contents:
+            # Check if file need to be writte.
+            if content['metadata']['updated'] and 'html' in content:
+                futures.append(engine.submit(
+                    file_writer, content, get_previous_hash(content, plan),
+                    engine))
+            else:
+                # Add to list to prevent deletion
+                written_files.append(content['metadata']['dst_file'])
+        pages = set(content['metadata']['dst_file']
+                    for content in context.contents)
 
-    logger.info('Copying static files.')
-    # Get output path
-    output_path = os.path.join(SETTINGS['ROOTDIR'], SETTINGS['OUTPUTDIR'])
-    # Run through and copy the rest of the files
-    for filename in input_files:
-        # Only copy html sources if configured
-        _, ext = os.path.splitext(filename)
-        if ext.lower() == '.md':
-            if SETTINGS['COPYSOURCES']:
-                written_files.append(copy_file(filename, output_path, update))
+        logger.info('Copying static files.')
+        # Get output path
+        output_path = os.path.join(SETTINGS['ROOTDIR'],
+                                   SETTINGS['OUTPUTDIR'])
+        # Run through and copy the rest of the files
+        for filename in input_files:
+            # Only copy html sources if configured
+            _, ext = os.path.splitext(filename)
+            if ext.lower() == '.md':
+                if SETTINGS['COPYSOURCES']:
+                    futures.append(engine.submit(
+                        _copy_input, filename, output_path, update, plan,
+                        engine))
+                else:
+                    logger.debug('Skipping: %s', filename)
+            # Skip duplicates of files created by ssg.
+            elif filename not in pages:
+                # Write other files.
+                futures.append(engine.submit(
+                    _copy_input, filename, output_path, update, plan,
+                    engine))
             else:
-                logger.debug('Skipping: ' + filename)
-        # Skip duplicates of files created by ssg.
-        elif filename not in written_files:
-            # Write other files.
-            written_files.append(copy_file(filename, output_path, update))
-        else:
-            logger.debug('Skipping: ' + filename)
-    # Remove files that are no longer in the source
-    cleanup_destination(output_path, written_files)
+                logger.debug('Skipping: %s', filename)
+        for future in futures:
+            written_files.append(future.result().strip())
+        logger.info('Wrote %s pages, %s were unchanged.',
+                    WRITE_STATS['written'], WRITE_STATS['identical'])
+        WRITE_STATS['written'] = 0
+        WRITE_STATS['identical'] = 0
+        # Remove files that are no longer in the source
+        cleanup_destination(output_path, written_files,
+                            get_previous_outputs(output_path, plan),
+                            engine=engine)
+    finally:
+        engine.close()
+    if plan is None:
+        save_manifest(output_path, written_files)
+    else:
+        # The build state records the files
+        _remove_manifest()
+    return written_files